@@ -0,0 +1,172 @@
+import hashlib
+import os
+import pickle
+import types
+from sklearn.base import BaseEstimator, TransformerMixin
+from .utils import check_dataframe, fingerprint
+
+
+def _code_state(code):
+    """
+    Bytecode, constants and names of a code object, nested code objects (eg inner functions) included
+    """
+    constants = tuple(_code_state(constant) if isinstance(constant, types.CodeType) else repr(constant)
+                      for constant in code.co_consts)
+    return code.co_code, constants, code.co_names
+
+
+def _function_state(value):
+    """
+    A python function stands for its code, defaults and closure instead of its name, so editing the body
+    of a function changes the digest, other values are kept as they are
+    """
+    if not isinstance(value, types.FunctionType):
+        return value
+    closure = tuple(cell.cell_contents for cell in value.__closure__ or ())
+    return ('function', value.__module__, value.__qualname__, _code_state(value.__code__),
+            value.__defaults__, closure)
+
+
+def _transformer_digest(transformer):
+    """
+    Digest of the class, parameters and fitted attributes of a transformer, functions passed as parameters
+    (eg to FunctionMapper) by their code, None when the state cannot be pickled
+    """
+    params = {name: _function_state(value) for name, value in transformer.get_params(deep=True).items()}
+    fitted = {name: value for name, value in vars(transformer).items() if name.endswith('_')}
+    try:
+        state = pickle.dumps((type(transformer).__module__, type(transformer).__qualname__, params, fitted),
+                             protocol=4)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return None
+    return hashlib.blake2b(state, digest_size=16).hexdigest()
+
+
+class CachedTransformer(BaseEstimator, TransformerMixin):
+    def __init__(self, transformer, cache_dir='.datamallet_cache', max_bytes=2**30):
+        """
+        CachedTransformer wraps a datamallet transformer and keeps its outputs on disk, keyed by the
+        parameters and fitted attributes of the transformer and a content digest of the input dataframe.
+        Running the same transformer on an unchanged dataframe loads the earlier output from an uncompressed
+        feather file through a memory map instead of transforming again. The input digest is utils.fingerprint,
+        which hashes the raw buffer of each column and is much cheaper than most transforms on large frames.
+        When the files in cache_dir grow past max_bytes the least recently used ones are deleted.
+        Requires pyarrow (pip install datamallet[parquet]). Outputs feather cannot store (eg duplicate column
+        names, mixed object columns) and transformers whose parameters cannot be pickled are transformed
+        without caching. A function passed as a parameter (eg to FunctionMapper) is keyed by its code,
+        defaults and closure, so editing it misses the cache, but a change to a global variable or to another
+        function it calls is not seen, clear the cache after such changes. The fitted attributes are read
+        when fit or partial_fit returns (or at the first transform for a transformer fitted before wrapping),
+        so attributes transform itself sets (eg bytes_saved_ of MemoryOptimizer) do not change the key. They
+        are not updated when an output is loaded from the cache.
+
+        :param transformer: datamallet transformer
+        :param cache_dir: str, directory holding the cached outputs, created if missing
+        :param max_bytes: int, size bound of cache_dir in bytes
+
+        Usage
+        >>> from datamallet.tabular.cache import CachedTransformer
+        >>> from datamallet.tabular.feature import SimpleEncoder
+        >>> import pandas as pd
+        >>> df = pd.DataFrame({'A':[1,2,3,4,5],'B':[2,4,6,8,10],'C':['dog','cat', 'sheep','dog','cat']})
+        >>> encoder = CachedTransformer(SimpleEncoder(columns=['C']), cache_dir='/tmp/datamallet_cache')
+        >>> df_e = encoder.transform(X=df)  # transforms and writes the output
+        >>> df_e = encoder.transform(X=df)  # loads the output
+        >>> encoder.hits_
+        1
+
+        """
+        self.transformer = transformer
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        assert hasattr(transformer, 'transform'), "transformer must have a transform method"
+        assert isinstance(cache_dir, str), "cache_dir must be a string"
+        assert isinstance(max_bytes, int) and max_bytes > 0, "max_bytes must be a positive integer"
+
+    def fit(self, X, y=None):
+        if hasattr(self.transformer, 'fit'):
+            self.transformer.fit(X, y)
+        self.digest_ = _transformer_digest(self.transformer)
+        return self
+
+    def partial_fit(self, X, y=None):
+        self.transformer.partial_fit(X)
+        self.digest_ = _transformer_digest(self.transformer)
+        return self
+
+    def _path(self, X):
+        """
+        Path of the cached output of the transformer for X, None when the transformer cannot be keyed
+        """
+        if not hasattr(self, 'digest_'):
+            self.digest_ = _transformer_digest(self.transformer)
+        if self.digest_ is None:
+            return None
+        key = hashlib.blake2b((self.digest_ + fingerprint(X)).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, key + '.feather')
+
+    def _evict(self):
+        """
+        Deletes the least recently used files until cache_dir is within max_bytes
+        """
+        entries = list()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.feather'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Deletes every cached output in cache_dir
+        """
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.feather'):
+                    os.remove(os.path.join(self.cache_dir, name))
+        return self
+
+    def transform(self, X, y=None):
+        from pyarrow import feather
+
+        assert check_dataframe(X), "X must be a pandas dataframe"
+        self.hits_ = getattr(self, 'hits_', 0)
+        self.misses_ = getattr(self, 'misses_', 0)
+        path = self._path(X)
+        if path is not None and os.path.exists(path):
+            try:
+                output = feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+                os.utime(path)  # the modification time orders the eviction
+            except (OSError, ValueError):
+                pass  # evicted or partly written by another process
+            else:
+                self.hits_ += 1
+                return output
+
+        self.misses_ += 1
+        output = self.transformer.transform(X)
+        if path is None or not check_dataframe(output):
+            return output
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        partial_path = '{}.{}.partial'.format(path, os.getpid())
+        try:
+            feather.write_feather(output, partial_path, compression='uncompressed')
+            os.replace(partial_path, path)
+        except (ValueError, TypeError, NotImplementedError):
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return output
+        self._evict()
+        return output
@@ -240,6 +240,10 @@ class SimpleEncoder(BaseEstimator, TransformerMixin):
         :param sparse:bool, Whether the dummy-encoded columns should be backed by a SparseArray (True)
                 or a regular NumPy array (False)
         :param drop_first:bool, Whether to get k-1 dummies out of k categorical levels by removing the first level
+
+        After partial_fit the categories of every batch seen so far are encoded, so every chunk of a large
+        dataset gets the same dummy columns, values not seen by partial_fit get zero in every dummy column.
+        fit discards the categories seen by partial_fit.
         """
         self.columns = columns
         self.dummy_na = dummy_na
@@ -251,9 +255,46 @@ class SimpleEncoder(BaseEstimator, TransformerMixin):
         assert isinstance(drop_first, bool)
 
     def fit(self, X, y=None):
+        if hasattr(self, 'categories_'):
+            del self.categories_
+        return self
+
+    def _encoded_columns(self, X):
+        if isinstance(self.columns, list):
+            return self.columns
+        if self.columns == 'auto':
+            return combine_categorical_columns(df=X, col_types=extract_col_types(df=X))
+        # the columns pandas.get_dummies encodes by default
+        return list(X.select_dtypes(include=['object', 'category']).columns)
+
+    def partial_fit(self, X, y=None):
+        """
+        Adds the categories found in a batch to the categories to encode
+        :param X: pandas dataframe
+        """
+        assert isinstance(X, pd.DataFrame)
+        categories = getattr(self, 'categories_', dict())
+        for col in self._encoded_columns(X):
+            seen = set(categories.get(col, list()))
+            seen.update(X[col].dropna().unique())
+            try:
+                categories[col] = sorted(seen)
+            except TypeError:
+                categories[col] = list(seen)
+        self.categories_ = categories
         return self
 
     def transform(self, X, y=None):
+        if check_dataframe(df=X) and hasattr(self, 'categories_') and check_columns(X, list(self.categories_)):
+            X = X.copy()
+            for col, categories in self.categories_.items():
+                X[col] = pd.Categorical(X[col], categories=categories)
+            return pd.get_dummies(data=X,
+                                  columns=list(self.categories_),
+                                  sparse=self.sparse,
+                                  drop_first=self.drop_first,
+                                  dummy_na=self.dummy_na)
+
         if check_dataframe(df=X) and ((self.columns in [None,'auto']) or isinstance(self.columns, list)):
             X = X.copy()
             if self.columns is None or (isinstance(self.columns,list) and check_columns(X,self.columns)):
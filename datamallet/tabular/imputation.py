@@ -163,6 +163,10 @@ class NaFiller(BaseEstimator, TransformerMixin):
           :param limit:int, default = None, the maximum number of missing values to be filled
           :param column_list:, list, default is None, list of column names to apply the imputation to
 
+          By default the mean of each column is taken from the dataframe being transformed. After partial_fit
+          the means of every batch seen so far are used instead, so data too large for memory can be
+          filled with the same values chunk by chunk. fit discards the batches seen by partial_fit.
+
           Usage
           # using method = bfill
           >>> import pandas as pd
@@ -233,6 +237,28 @@ class NaFiller(BaseEstimator, TransformerMixin):
         assert isinstance(column_list,list) or column_list is None
 
     def fit(self, X, y=None):
+        for attribute in ['sums_', 'counts_', 'means_']:
+            if hasattr(self, attribute):
+                delattr(self, attribute)
+        return self
+
+    def partial_fit(self, X, y=None):
+        """
+        Adds the sum and count of the non missing values of a batch to the running column means,
+        only used by method mean
+        :param X: pandas dataframe
+        """
+        assert isinstance(X, pd.DataFrame)
+        if self.method == 'mean':
+            column_list = self.column_list if self.column_list is not None else extract_numeric_cols(df=X)
+            sums = X.loc[:, column_list].sum()
+            counts = X.loc[:, column_list].count()
+            if hasattr(self, 'sums_'):
+                sums = self.sums_.add(sums, fill_value=0)
+                counts = self.counts_.add(counts, fill_value=0)
+            self.sums_ = sums
+            self.counts_ = counts
+            self.means_ = sums / counts.where(counts > 0)
         return self
 
     def transform(self, X, y=None):
@@ -264,11 +290,14 @@ class NaFiller(BaseEstimator, TransformerMixin):
         if self.method == 'mean':
 
             if isinstance(self.column_list, list) and check_numeric(df=X,column_list=self.column_list):
-                X.fillna(value=column_mean(df=X, column_list=self.column_list), inplace=True,limit=self.limit)
+                means = self.means_ if hasattr(self, 'means_') else column_mean(df=X, column_list=self.column_list)
+                X.fillna(value=means, inplace=True,limit=self.limit)
                 return X
             if self.column_list is None:
                 numeric_cols = extract_numeric_cols(df=X)
 
                 # if no columns are specified, use only numeric columns
-                X.fillna(value=column_mean(df=X, column_list=numeric_cols), inplace=True, limit=self.limit)
+                means = self.means_.reindex(numeric_cols) if hasattr(self, 'means_') \
+                    else column_mean(df=X, column_list=numeric_cols)
+                X.fillna(value=means, inplace=True, limit=self.limit)
                 return X
\ No newline at end of file
@@ -0,0 +1,412 @@
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+from .feature import SimpleEncoder
+from .imputation import NaFiller
+from .utils import check_dataframe, extract_numeric_cols
+
+
+def _effective_jobs(n_jobs):
+    """
+    Number of worker processes for n_jobs, None is 1 and negative values count back from the number of cpus
+    (-1 is every cpu) like scikit-learn
+    """
+    if n_jobs is None:
+        return 1
+    assert isinstance(n_jobs, int) and n_jobs != 0, "n_jobs must be None or a non zero integer"
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def _chunk_bounds(n_rows, n_chunks):
+    """
+    Splits n_rows into at most n_chunks contiguous chunks of nearly equal size
+    :return: list of (start, stop) row positions
+    """
+    edges = np.linspace(0, n_rows, min(n_chunks, max(n_rows, 1)) + 1).astype(np.int64)
+    return [(start, stop) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def _shareable(dtype):
+    """
+    Columns with a plain numpy numeric, boolean or datetime dtype can be placed in shared memory as they are
+    """
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM'
+
+
+class SharedFrame(object):
+    def __init__(self, df):
+        """
+        SharedFrame publishes a dataframe in shared memory once so worker processes can read it without a copy.
+        Numeric, boolean and datetime columns (timezone aware included) and the codes of categorical columns
+        are copied back to back into one multiprocessing.shared_memory block. The descriptor of the frame
+        is small and picklable, a worker passes it to attach_frame to get a read only dataframe whose columns
+        are views of the block. Other columns (eg object) cannot be shared and travel in the descriptor.
+        The block is freed by close, or at the end of a with statement.
+
+        :param df: pandas dataframe
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.parallel import SharedFrame, attach_frame
+        >>> df = pd.DataFrame({'A':[1,2,3,4,5],'B':[2,4,6,8,10]})
+        >>> with SharedFrame(df) as shared:
+        ...     descriptor = shared.descriptor(rows=(0, 3))  # sent to a worker, eg with ProcessPoolExecutor.submit
+        ...     with attach_frame(descriptor) as X:  # in the worker
+        ...         total = X['A'].sum()
+        >>> total
+        6
+
+        """
+        assert isinstance(df, pd.DataFrame), 'df needs to be a pandas dataframe'
+        self.rows = len(df)
+        self.columns = df.columns
+        arrays = list()
+        offset = 0
+
+        def reserve(values):
+            nonlocal offset
+            arrays.append((offset, values))
+            start = offset
+            # keep every array aligned to 8 bytes
+            offset += -(-values.nbytes // 8) * 8
+            return start
+
+        self.entries = list()
+        for position in range(df.shape[1]):
+            column = df.iloc[:, position]
+            dtype = column.dtype
+            if _shareable(dtype):
+                values = column.to_numpy()
+                self.entries.append(('array', values.dtype.str, reserve(values)))
+            elif isinstance(dtype, pd.CategoricalDtype):
+                codes = column.array.codes
+                self.entries.append(('categorical', codes.dtype.str, reserve(codes), dtype.categories, dtype.ordered))
+            elif isinstance(dtype, pd.DatetimeTZDtype):
+                self.entries.append(('datetimetz', '<i8', reserve(column.array.asi8), dtype.tz))
+            else:
+                self.entries.append(('values', column.array))
+
+        if isinstance(df.index, pd.RangeIndex) or not _shareable(df.index.dtype):
+            self.index_entry = ('values', df.index)
+        else:
+            self.index_entry = ('array', df.index.dtype.str, reserve(df.index.to_numpy()), df.index.name)
+
+        self.block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for start, values in arrays:
+            view = np.ndarray(values.shape, dtype=values.dtype, buffer=self.block.buf, offset=start)
+            view[:] = values
+            del view
+
+    def descriptor(self, columns=None, rows=None):
+        """
+        Picklable description of the frame, or of some of its columns and rows
+        :param columns: list of column names, default is every column
+        :param rows: tuple (start, stop) of row positions, default is every row
+        :return: dictionary to pass to attach_frame
+        """
+        positions = range(len(self.columns)) if columns is None else self.columns.get_indexer(columns)
+        start, stop = rows if rows is not None else (0, self.rows)
+
+        def cut(entry):
+            # only the values that are not shared are sliced here, the rest is sliced by attach_frame
+            return ('values', entry[1][start:stop]) if entry[0] == 'values' else entry
+
+        return {'name': self.block.name,
+                'rows': self.rows,
+                'start': start,
+                'stop': stop,
+                'columns': self.columns[positions],
+                'entries': [cut(self.entries[position]) for position in positions],
+                'index': cut(self.index_entry)}
+
+    def close(self):
+        self.block.close()
+        self.block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# blocks whose arrays were still in use when their attach_frame ended, closed once they are free
+_lingering_blocks = list()
+
+
+def _close_lingering():
+    for block in list(_lingering_blocks):
+        try:
+            block.close()
+            _lingering_blocks.remove(block)
+        except BufferError:
+            pass
+
+
+def _shared_array(block, entry, descriptor):
+    kind, dtype, offset = entry[:3]
+    array = np.ndarray((descriptor['rows'],), dtype=dtype, buffer=block.buf, offset=offset)
+    array = array[descriptor['start']:descriptor['stop']]
+    array.flags.writeable = False
+    return array
+
+
+@contextmanager
+def attach_frame(descriptor):
+    """
+    Rebuilds a dataframe published by SharedFrame inside a worker process, without copying the shared columns.
+    The dataframe is read only, transformers that change their input copy it first as usual.
+    It must not be used after the with statement.
+    :param descriptor: dictionary from SharedFrame.descriptor
+    :return: context manager giving a pandas dataframe
+    """
+    _close_lingering()
+    block = shared_memory.SharedMemory(name=descriptor['name'])
+    try:
+        data = dict()
+        for j, entry in enumerate(descriptor['entries']):
+            if entry[0] == 'array':
+                data[j] = _shared_array(block, entry, descriptor)
+            elif entry[0] == 'categorical':
+                data[j] = pd.Categorical.from_codes(_shared_array(block, entry, descriptor),
+                                                    categories=entry[3],
+                                                    ordered=entry[4])
+            elif entry[0] == 'datetimetz':
+                data[j] = pd.arrays.DatetimeArray(_shared_array(block, entry, descriptor).view('M8[ns]'),
+                                                  dtype=pd.DatetimeTZDtype(tz=entry[3]))
+            else:
+                data[j] = entry[1]
+
+        index_entry = descriptor['index']
+        if index_entry[0] == 'array':
+            index = pd.Index(_shared_array(block, index_entry, descriptor), name=index_entry[3], copy=False)
+        else:
+            index = index_entry[1]
+
+        frame = pd.DataFrame(data, index=index, copy=False)
+        frame.columns = descriptor['columns']
+        del data
+        yield frame
+    finally:
+        frame = None
+        try:
+            block.close()
+        except BufferError:
+            _lingering_blocks.append(block)
+
+
+def _apply_chunk(func, col_name, descriptor):
+    with attach_frame(descriptor) as chunk:
+        if col_name is None:
+            return chunk.apply(func, axis='columns')
+        return chunk[col_name].apply(func)
+
+
+def parallel_apply(X, func, col_name=None, n_jobs=-1, chunks_per_job=4):
+    """
+    Applies a row-wise python function over the rows of X on a pool of processes.
+    X is published once with SharedFrame, every worker reads its chunk of rows from shared memory,
+    only the columns that cannot be shared are pickled, chunk by chunk.
+    :param X: pandas dataframe
+    :param func: python function of a row (a pandas series), or of a single value when col_name is given.
+            It is sent to the workers so it must be picklable eg defined at module level, not a lambda.
+    :param col_name: str, column to apply func to, None applies func to whole rows
+    :param n_jobs: int, number of processes, -1 uses every cpu
+    :param chunks_per_job: int, number of chunks per process, more chunks balance uneven rows better
+    :return: pandas series with the index of X
+
+    Usage
+    >>> import pandas as pd
+    >>> from datamallet.tabular.parallel import parallel_apply
+    >>> df = pd.DataFrame({'A':[1,2,3,4,5],'B':[2,4,6,8,10]})
+    >>> result = parallel_apply(X=df, func=max, n_jobs=2)
+
+    """
+    assert isinstance(X, pd.DataFrame), 'X needs to be a pandas dataframe'
+    assert isinstance(chunks_per_job, int) and chunks_per_job > 0, "chunks_per_job must be a positive integer"
+    n_jobs = _effective_jobs(n_jobs)
+    if n_jobs == 1 or len(X) == 0:
+        return X.apply(func, axis='columns') if col_name is None else X[col_name].apply(func)
+
+    columns = None if col_name is None else [col_name]
+    with SharedFrame(X if col_name is None else X.loc[:, columns]) as shared, \
+            ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [pool.submit(_apply_chunk, func, col_name, shared.descriptor(rows=rows))
+                   for rows in _chunk_bounds(len(X), n_jobs * chunks_per_job)]
+        results = [future.result() for future in futures]
+
+    return pd.concat(results)
+
+
+def _column_parameter(transformer):
+    """
+    Name of the parameter holding the columns a transformer works on
+    """
+    params = transformer.get_params(deep=False)
+    for name in ['column_list', 'columns']:
+        if name in params:
+            return name
+    raise AssertionError("transformer must have a column_list or columns parameter")
+
+
+def _resolve_columns(transformer, X):
+    """
+    Columns the transformer works on in X, including when it is left to choose them itself
+    """
+    columns = transformer.get_params(deep=False)[_column_parameter(transformer)]
+    if isinstance(columns, list):
+        return columns
+    if isinstance(transformer, SimpleEncoder):
+        return transformer._encoded_columns(X)
+    if isinstance(transformer, NaFiller) and transformer.method == 'mean':
+        return extract_numeric_cols(df=X)
+    return list(X.columns)
+
+
+def _shard_frame(X, shard):
+    """
+    Dataframe of the shard columns, every column a view of the column in X
+    """
+    positions = X.columns.get_indexer(shard)
+    frame = pd.DataFrame({j: X.iloc[:, position] for j, position in enumerate(positions)}, index=X.index, copy=False)
+    frame.columns = pd.Index(shard)
+    return frame
+
+
+def _transform_shard(transformer, X):
+    return transformer.transform(X)
+
+
+def _transform_shared(transformer, descriptor):
+    with attach_frame(descriptor) as X:
+        return transformer.transform(X)
+
+
+def _assemble(X, shards, outputs):
+    """
+    Puts the shard outputs back together without copying, in a fixed order whatever order they finished in.
+    A shard output with the same columns as its input replaces them in place, any other output replaces
+    its input columns with its own columns after the untouched columns of X, like pandas.get_dummies.
+    """
+    replaced = dict()
+    dropped = set()
+    appended = list()
+    for shard, output in zip(shards, outputs):
+        assert len(output) == len(X), "the transformer must keep every row"
+        if list(output.columns) == list(shard):
+            replaced.update((col, output[col]) for col in shard)
+        else:
+            dropped.update(shard)
+            appended.append(output)
+
+    data = dict()
+    names = list()
+    for position, col in enumerate(X.columns):
+        if col not in dropped:
+            data[len(names)] = replaced[col] if col in replaced else X.iloc[:, position]
+            names.append(col)
+    for output in appended:
+        for j, col in enumerate(output.columns):
+            data[len(names)] = output.iloc[:, j]
+            names.append(col)
+
+    assembled = pd.DataFrame(data, index=X.index, copy=False)
+    assembled.columns = pd.Index(names)
+    return assembled
+
+
+class ColumnParallel(BaseEstimator, TransformerMixin):
+    def __init__(self, transformer, n_jobs=-1, backend='thread', n_shards=None):
+        """
+        ColumnParallel runs a transformer that works on each column on its own (eg ExpandingTransformer,
+        NaFiller, SimpleEncoder) on shards of its columns at the same time.
+        The columns are split into contiguous shards, a copy of the transformer is run on each shard and
+        the outputs are put back together in column order, so the result is the same as running the
+        transformer once. Shards only hold views of their columns and the result is built from views
+        of the shard outputs, so no column is copied more than the transformer itself copies it.
+
+        :param transformer: datamallet transformer with a column_list or columns parameter, it is cloned per shard
+        :param n_jobs: int, number of workers, -1 uses every cpu
+        :param backend: str, thread or process. Threads share the dataframe and suit the pandas and numpy
+                kernels that release the GIL, processes suit kernels that hold it. For processes the columns
+                are published once with SharedFrame and each process reads its shard from shared memory.
+        :param n_shards: int, number of shards, default is one per worker
+
+        Usage
+        >>> import pandas as pd
+        >>> import numpy as np
+        >>> from datamallet.tabular.parallel import ColumnParallel
+        >>> from datamallet.tabular.feature import ExpandingTransformer
+        >>> df = pd.DataFrame(np.random.rand(1000, 8), columns=list('ABCDEFGH'))
+        >>> expander = ColumnParallel(ExpandingTransformer(column_list=list('ABCDEFGH')), n_jobs=4)
+        >>> df_new = expander.transform(X=df)
+
+        """
+        self.transformer = transformer
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.n_shards = n_shards
+        _column_parameter(transformer)
+        assert backend in ['thread', 'process'], "backend must be thread or process"
+        assert n_shards is None or (isinstance(n_shards, int) and n_shards > 0), "n_shards must be a positive integer"
+
+    def _shards(self, X):
+        columns = _resolve_columns(self.transformer, X)
+        n_shards = self.n_shards if self.n_shards is not None else _effective_jobs(self.n_jobs)
+        return [columns[start:stop] for start, stop in _chunk_bounds(len(columns), n_shards) if stop > start]
+
+    def _shard_transformers(self, X):
+        """
+        Fitted shard transformers when their columns are in X, otherwise new copies of the transformer
+        """
+        if hasattr(self, 'shards_') and all(col in X.columns for shard in self.shards_ for col in shard):
+            return self.shards_, self.transformers_
+        shards = self._shards(X)
+        name = _column_parameter(self.transformer)
+        return shards, [clone(self.transformer).set_params(**{name: shard}) for shard in shards]
+
+    def _map(self, func, arguments):
+        n_jobs = min(_effective_jobs(self.n_jobs), max(len(arguments), 1))
+        if n_jobs == 1:
+            return [func(*argument) for argument in arguments]
+        executor = ThreadPoolExecutor if self.backend == 'thread' else ProcessPoolExecutor
+        with executor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(func, *argument) for argument in arguments]
+            return [future.result() for future in futures]
+
+    def fit(self, X, y=None):
+        assert check_dataframe(X), 'X needs to be a pandas dataframe'
+        if hasattr(self, 'shards_'):
+            del self.shards_, self.transformers_
+        self.shards_, self.transformers_ = self._shard_transformers(X)
+        for shard, transformer in zip(self.shards_, self.transformers_):
+            transformer.fit(_shard_frame(X, shard))
+        return self
+
+    def partial_fit(self, X, y=None):
+        assert check_dataframe(X), 'X needs to be a pandas dataframe'
+        self.shards_, self.transformers_ = self._shard_transformers(X)
+        for shard, transformer in zip(self.shards_, self.transformers_):
+            transformer.partial_fit(_shard_frame(X, shard))
+        return self
+
+    def transform(self, X, y=None):
+        if not check_dataframe(X):
+            return X
+        shards, transformers = self._shard_transformers(X)
+        if self.backend == 'process':
+            with SharedFrame(_shard_frame(X, [col for shard in shards for col in shard])) as shared:
+                outputs = self._map(_transform_shared,
+                                    [(transformer, shared.descriptor(columns=shard))
+                                     for shard, transformer in zip(shards, transformers)])
+        else:
+            outputs = self._map(_transform_shard,
+                                [(transformer, _shard_frame(X, shard))
+                                 for shard, transformer in zip(shards, transformers)])
+        return _assemble(X, shards, outputs)
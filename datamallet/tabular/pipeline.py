@@ -0,0 +1,551 @@
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue, Full
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+from .preprocess import (ColumnDropper, ColumnRename, ColumnSelector, FunctionMapper, MemoryOptimizer,
+                         TypeInferrer, _project)
+from .imputation import NaFiller, ConstantValueFiller
+from .feature import ColumnAdder, ColumnMultiplier, ColumnSubtraction, ExpandingTransformer
+from .parallel import SharedFrame, attach_frame, _effective_jobs
+from .utils import check_columns, check_dataframe
+
+
+def _source_columns(source):
+    """
+    Column names of a parquet or csv file, read from the file metadata or header only
+    :param source: str, path of a .parquet or .csv file
+    :return: list of column names
+    """
+    if str(source).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(source)
+        metadata = schema.pandas_metadata or dict()
+        index_columns = [col for col in metadata.get('index_columns', list()) if isinstance(col, str)]
+        return [name for name in schema.names if name not in index_columns]
+    return list(pd.read_csv(source, nrows=0).columns)
+
+
+def _read_source(source, columns, read_kwargs):
+    """
+    Reads only columns from a parquet or csv file
+    """
+    if str(source).endswith('.parquet'):
+        return pd.read_parquet(source, columns=columns, **read_kwargs)
+    return pd.read_csv(source, usecols=columns, **read_kwargs)
+
+
+def _iter_source(source, columns, chunk_size, read_kwargs):
+    """
+    Reads columns of a source chunk by chunk
+    :param source: pandas dataframe, str path of a parquet or csv file, or list of such paths
+    :param columns: list of the column names to read
+    :param chunk_size: int, number of rows in a chunk
+    :return: generator of pandas dataframes
+    """
+    if isinstance(source, pd.DataFrame):
+        # keep only the planned columns, in the order of the frame like a file reader would
+        wanted = set(columns)
+        positions = [position for position, col in enumerate(source.columns) if col in wanted]
+        if len(positions) < source.shape[1]:
+            source = _project(source, positions)
+        for start in range(0, len(source), chunk_size):
+            yield source.iloc[start:start + chunk_size]
+        return
+
+    for path in ([source] if isinstance(source, str) else source):
+        if str(path).endswith('.parquet'):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+                yield batch.to_pandas()
+        else:
+            for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_size, **read_kwargs):
+                yield chunk
+
+
+def _prefetch(chunks, depth):
+    """
+    Reads the chunks on a background thread, at most depth chunks ahead of the one being used
+    :param chunks: iterator of pandas dataframes
+    :param depth: int, number of chunks read ahead, 0 reads them on the calling thread
+    :return: generator of pandas dataframes
+    """
+    if depth == 0:
+        for chunk in chunks:
+            yield chunk
+        return
+
+    queue = Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for chunk in chunks:
+                if not put(('chunk', chunk)):
+                    return
+            put(('done', None))
+        except BaseException as error:
+            put(('error', error))
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            kind, item = queue.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise item
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+
+def _step_columns(step, columns):
+    """
+    Columns a step reads and writes, given the columns of its input
+    :param step: datamallet transformer
+    :param columns: list of the column names going into the step
+    :return: dictionary with
+            kind: projection (renames, drops or selects columns), columnwise (changes each column on its own),
+                derive (adds or overwrites columns from other columns) or opaque (anything else)
+            pairs: for a projection, list of (output name, input name) pairs in output order
+            reads: for derive and columnwise, list of columns that must be present for the step to run
+            writes: for columnwise and derive, list of columns written
+    """
+    present = set(columns)
+    if isinstance(step, ColumnSelector):
+        keep = step.column_list if set(step.column_list) <= present else columns
+        return {'kind': 'projection', 'pairs': [(col, col) for col in keep]}
+    if isinstance(step, ColumnDropper):
+        dropped = set(step.column_list) if set(step.column_list) <= present else set()
+        return {'kind': 'projection', 'pairs': [(col, col) for col in columns if col not in dropped]}
+    if isinstance(step, ColumnRename):
+        renames = step.rename_dictionary if set(step.rename_dictionary) <= present else dict()
+        pairs = [(renames.get(col, col), col) for col in columns]
+        # columns are planned by name, a rename onto an existing name is run as it is
+        if len(set(output for output, source in pairs)) < len(pairs):
+            return {'kind': 'opaque'}
+        return {'kind': 'projection', 'pairs': pairs}
+
+    # steps given explicit columns check that all of them are present, so they are read together
+    if isinstance(step, (NaFiller, ExpandingTransformer, MemoryOptimizer, TypeInferrer)) and step.column_list is not None:
+        return {'kind': 'columnwise', 'reads': list(step.column_list), 'writes': list(step.column_list)}
+    if isinstance(step, ConstantValueFiller) and isinstance(step.value, dict):
+        return {'kind': 'columnwise', 'reads': list(step.value), 'writes': list(step.value)}
+    if isinstance(step, (NaFiller, ConstantValueFiller, MemoryOptimizer, TypeInferrer)):
+        return {'kind': 'columnwise', 'reads': list(), 'writes': list(columns)}
+
+    if isinstance(step, (ColumnAdder, ColumnMultiplier)):
+        return {'kind': 'derive', 'reads': list(step.column_list), 'writes': [step.new_column_name]}
+    if isinstance(step, ColumnSubtraction):
+        return {'kind': 'derive', 'reads': [step.left, step.right], 'writes': [step.new_column_name]}
+    if isinstance(step, FunctionMapper) and step.col_name is not None and step.axis == 'columns':
+        return {'kind': 'derive', 'reads': [step.col_name], 'writes': [step.new_col_name]}
+
+    return {'kind': 'opaque'}
+
+
+def _merge_projections(stages):
+    """
+    Merges every run of consecutive projection stages into a single projection
+    """
+    merged_stages = list()
+    for stage in stages:
+        if stage['kind'] == 'projection' and merged_stages and merged_stages[-1]['kind'] == 'projection':
+            previous = merged_stages[-1]
+            sources = dict(previous['pairs'])
+            previous['pairs'] = [(output, sources[source]) for output, source in stage['pairs']]
+            previous['steps'] = previous['steps'] + stage['steps']
+            continue
+        merged_stages.append(stage)
+    return merged_stages
+
+
+class _Projection(BaseEstimator, TransformerMixin):
+    def __init__(self, pairs):
+        """
+        Renames, drops and selects columns in one step, the output columns are views of the input columns
+        :param pairs: list of (output name, input name) pairs in output order
+        """
+        self.pairs = pairs
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X, y=None):
+        positions = dict()
+        for position, col in enumerate(X.columns):
+            positions.setdefault(col, position)
+        # a column is missing when the step that should have created it did nothing, as it would when run alone
+        pairs = [(output, source) for output, source in self.pairs if source in positions]
+        X = _project(X, [positions[source] for output, source in pairs])
+        X.columns = pd.Index([output for output, source in pairs])
+        return X
+
+
+class LazyPipeline(BaseEstimator, TransformerMixin):
+    def __init__(self, steps, read_kwargs=None):
+        """
+        LazyPipeline runs a list of datamallet transformers after planning which columns each one needs.
+        Given the input columns (of a dataframe, or of a parquet or csv file read from its header) the planner
+            - merges consecutive ColumnRename, ColumnDropper and ColumnSelector steps into one projection
+              whose columns are views of its input,
+            - removes steps whose output columns are never used eg a derived column dropped later on,
+            - finds the columns of the source the pipeline needs, only these are read from a file.
+        Steps the planner knows nothing about (eg the timeseries transformers) are run unchanged on every
+        column that reaches them. The output is the same as running the steps one after the other,
+        provided the steps are valid for the input eg the columns ColumnAdder adds up are numeric.
+
+        :param steps: list of datamallet transformers, run in order
+        :param read_kwargs: dictionary of extra keyword arguments for pandas.read_parquet or pandas.read_csv
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.pipeline import LazyPipeline
+        >>> from datamallet.tabular.preprocess import ColumnDropper, ColumnRename, ColumnSelector
+        >>> from datamallet.tabular.feature import ColumnAdder
+        >>> df = pd.DataFrame({'A':[1,2,3],'B':[2,4,6],'C':['dog','cat','sheep'],'D':[0.5,0.1,0.2]})
+        >>> pipeline = LazyPipeline(steps=[ColumnDropper(column_list=['C']),
+        ...                                ColumnRename(rename_dictionary={'A':'V'}),
+        ...                                ColumnAdder(column_list=['V','D'], new_column_name='Z'),
+        ...                                ColumnSelector(column_list=['V','B'])])
+        >>> print(pipeline.transform(X=df))
+           V  B
+        0  1  2
+        1  2  4
+        2  3  6
+        >>> pipeline.source_columns_
+        ['A', 'B']
+
+        """
+        self.steps = steps
+        self.read_kwargs = read_kwargs
+        assert isinstance(steps, list) and len(steps) > 0, "steps must be a non empty list of transformers"
+        assert read_kwargs is None or isinstance(read_kwargs, dict), "read_kwargs must be None or a dictionary"
+
+    def plan(self, columns):
+        """
+        Plans the pipeline for an input with the given columns, sets plan_ (the list of transformers that
+        are run), pruned_steps_ (the steps left out) and source_columns_ (the input columns that are needed)
+        :param columns: list of the input column names
+        :return: self
+        """
+        self.planned_columns_ = list(columns)
+        columns = self.planned_columns_ if len(set(columns)) == len(columns) else None
+
+        # forward pass: the columns going into every step, steps that would do nothing are left out.
+        # The columns coming out of an opaque step are unknown, the steps after it are run unchanged
+        stages = list()
+        pruned = list()
+        for step in self.steps:
+            if columns is None:
+                stages.append({'kind': 'opaque', 'steps': [step], 'columns_in': None})
+                continue
+            analysis = _step_columns(step, columns)
+            if analysis['kind'] in ['columnwise', 'derive'] and not set(analysis['reads']) <= set(columns):
+                pruned.append(step)
+                continue
+            if analysis['kind'] == 'projection':
+                columns_out = [output for output, source in analysis['pairs']]
+            elif analysis['kind'] == 'derive':
+                columns_out = columns + [col for col in analysis['writes'] if col not in columns]
+            elif analysis['kind'] == 'columnwise':
+                columns_out = columns
+            else:
+                columns_out = None
+            analysis.update({'steps': [step], 'columns_in': columns})
+            stages.append(analysis)
+            columns = columns_out
+
+        # backward pass: the columns each stage has to produce, stages producing nothing needed are removed
+        needed = set(columns) if columns is not None else None
+        kept = list()
+        for stage in reversed(stages):
+            if stage['columns_in'] is None:
+                kept.append(stage)
+                continue
+            if stage['kind'] == 'projection':
+                stage['pairs'] = [(output, source) for output, source in stage['pairs'] if output in needed]
+                needed = {source for output, source in stage['pairs']}
+            elif stage['kind'] in ['columnwise', 'derive']:
+                if not needed.intersection(stage['writes']):
+                    pruned.extend(stage['steps'])
+                    continue
+                # columns a derive step overwrites are kept so they stay in place
+                created = set(stage['writes']) - set(stage['columns_in'])
+                needed = (needed - created) | set(stage['reads'])
+            else:
+                needed = set(stage['columns_in'])
+            kept.append(stage)
+        kept = _merge_projections(kept[::-1])
+
+        self.source_columns_ = [col for col in self.planned_columns_ if needed is None or col in needed]
+        self.plan_ = [_Projection(pairs=stage['pairs']) if stage['kind'] == 'projection' else stage['steps'][0]
+                      for stage in kept]
+        self.pruned_steps_ = [step for step in self.steps if any(step is other for other in pruned)]
+        return self
+
+    def _prepare(self, X):
+        """
+        Plans for X unless the plan is already for its columns, and reads X when it is a file path
+        """
+        columns = _source_columns(X) if isinstance(X, str) else list(X.columns)
+        if getattr(self, 'planned_columns_', None) != columns:
+            self.plan(columns)
+        if isinstance(X, str):
+            return _read_source(X, self.source_columns_, self.read_kwargs or dict())
+        if len(self.source_columns_) < X.shape[1] and X.columns.is_unique:
+            return _project(X, X.columns.get_indexer(self.source_columns_))
+        return X
+
+    def fit(self, X, y=None):
+        """
+        :param X: pandas dataframe, or str path of a parquet or csv file
+        """
+        X = self._prepare(X)
+        for step in self.plan_:
+            X = step.fit_transform(X)
+        return self
+
+    def transform(self, X, y=None):
+        """
+        :param X: pandas dataframe, or str path of a parquet or csv file
+        :return: pandas dataframe
+        """
+        assert isinstance(X, str) or check_dataframe(X), "X must be a pandas dataframe or a file path"
+        X = self._prepare(X)
+        for step in self.plan_:
+            X = step.transform(X)
+        return X
+
+
+def _run_steps(steps, descriptor):
+    with attach_frame(descriptor) as chunk:
+        for step in steps:
+            chunk = step.transform(chunk)
+        return chunk
+
+
+def _carries_rows(step):
+    """
+    Whether the output of a step for a chunk depends on the rows of the chunks around it
+    """
+    return isinstance(step, NaFiller) and step.method in ['ffill', 'bfill']
+
+
+def _fill_forward(step, chunks):
+    """
+    Runs a forward filling NaFiller over chunks as if they were one dataframe. Each chunk is filled after the
+    last filled row before it, or with a limit after the last limit rows before it as they were before filling,
+    since a value further back cannot reach the chunk
+    """
+    context = None
+    for chunk in chunks:
+        combined = chunk if context is None else pd.concat([context, chunk])
+        filled = step.transform(combined)
+        yield filled.iloc[len(combined) - len(chunk):]
+        context = filled.iloc[-1:] if step.limit is None else combined.iloc[-step.limit:]
+
+
+def _fill_backward(step, chunks):
+    """
+    Runs a backward filling NaFiller over chunks as if they were one dataframe. Rows that the next chunk can
+    still fill (rows still missing a value after filling, with a limit only the last limit rows) are held back
+    and filled again together with the next chunk, so the chunks that come out are not the chunks that went in
+    """
+    pending = None
+    for chunk in chunks:
+        combined = chunk if pending is None else pd.concat([pending, chunk])
+        filled = step.transform(combined)
+        columns = list(filled.columns) if step.column_list is None else \
+            step.column_list if check_columns(df=filled, column_list=step.column_list) else list()
+        open_rows = filled.loc[:, columns].isna().any(axis=1).to_numpy()
+        if step.limit is not None:
+            open_rows[:max(len(combined) - step.limit, 0)] = False
+        first_open = int(open_rows.argmax()) if open_rows.any() else len(combined)
+        pending = combined.iloc[first_open:]
+        if first_open > 0:
+            yield filled.iloc[:first_open]
+    if pending is not None and len(pending) > 0:
+        yield step.transform(pending)
+
+
+def _stream(step, chunks):
+    """
+    Runs a fitted step over an iterator of chunks
+    """
+    if _carries_rows(step):
+        return _fill_forward(step, chunks) if step.method == 'ffill' else _fill_backward(step, chunks)
+    return (step.transform(chunk) for chunk in chunks)
+
+
+def _fit_stream(step, chunks):
+    """
+    Fits a step on every chunk with partial_fit, or on the first chunk with fit, and passes the chunks on
+    """
+    for position, chunk in enumerate(chunks):
+        if hasattr(step, 'partial_fit'):
+            step.partial_fit(chunk)
+        elif position == 0:
+            step.fit(chunk)
+        yield chunk
+
+
+class ChunkedRunner(BaseEstimator):
+    def __init__(self, steps, chunk_size=100000, prefetch=1, read_kwargs=None, n_jobs=None):
+        """
+        ChunkedRunner runs a list of datamallet transformers over data too large for memory, one chunk at a time.
+        fit streams the source once, every step with a partial_fit method (eg NaFiller, SimpleEncoder)
+        learns from each chunk as it comes out of the steps before it. transform streams the source again
+        and runs every chunk through the fitted steps, write does the same and appends each chunk to a
+        parquet file. The columns are planned like LazyPipeline so only the columns the steps need are read,
+        and a background thread reads the next chunks while the current one is transformed.
+        Memory is bounded by about chunk_size * (prefetch + 2) rows, plus n_jobs chunks in flight when
+        transforming on processes.
+
+        Steps are cloned, the fitted steps are in steps_. A step fitted with partial_fit sees the output of the
+        steps before it as they were fitted up to that chunk, eg the categories SimpleEncoder learns after
+        NaFiller do not depend on the fill values. A step without partial_fit (eg TypeInferrer) is fitted on
+        the first chunk only, so that chunk should be representative.
+        NaFiller with method ffill or bfill gives the same values as on the whole data: ffill carries the
+        last rows of a chunk into the next one, bfill holds back the rows still missing a value until a later
+        chunk fills them, so a long run of missing values is held in memory and chunks come out merged.
+        These pipelines transform on the calling process whatever n_jobs is. ExpandingTransformer, whose
+        output depends on every earlier row, cannot run chunk by chunk and is rejected.
+
+        :param steps: list of datamallet transformers, run in order
+        :param chunk_size: int, number of rows in a chunk
+        :param prefetch: int, number of chunks read ahead on a background thread, 0 reads on the calling thread
+        :param read_kwargs: dictionary of extra keyword arguments for pandas.read_csv
+        :param n_jobs: int, number of processes transforming chunks, None transforms on the calling process and
+                -1 uses all cores. Each chunk is published once with SharedFrame and read from shared memory by
+                the process, chunks come out in the order they were read. fit always runs on the calling process.
+
+        Usage
+        >>> from datamallet.tabular.pipeline import ChunkedRunner
+        >>> from datamallet.tabular.imputation import NaFiller
+        >>> from datamallet.tabular.feature import ColumnAdder, SimpleEncoder
+        >>> runner = ChunkedRunner(steps=[NaFiller(method='mean'),
+        ...                               ColumnAdder(column_list=['A', 'B'], new_column_name='Z'),
+        ...                               SimpleEncoder(columns=['C'])],
+        ...                        chunk_size=1000000)
+        >>> rows = runner.fit('data.csv').write('data.csv', path='features.parquet')
+
+        """
+        self.steps = steps
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.read_kwargs = read_kwargs
+        self.n_jobs = n_jobs
+        assert isinstance(steps, list) and len(steps) > 0, "steps must be a non empty list of transformers"
+        assert isinstance(chunk_size, int) and chunk_size > 0, "chunk_size must be a positive integer"
+        assert isinstance(prefetch, int) and prefetch >= 0, "prefetch must be a non negative integer"
+        assert read_kwargs is None or isinstance(read_kwargs, dict), "read_kwargs must be None or a dictionary"
+        assert n_jobs is None or isinstance(n_jobs, int), "n_jobs must be None or an integer"
+        assert not any(isinstance(step, ExpandingTransformer) for step in steps), \
+            "ExpandingTransformer depends on every earlier row and cannot run chunk by chunk"
+
+    def _chunks(self, X):
+        """
+        Plans the steps for the columns of X and reads X chunk by chunk
+        """
+        if isinstance(X, pd.DataFrame):
+            columns = list(X.columns)
+        else:
+            columns = _source_columns(X if isinstance(X, str) else X[0])
+        self.pipeline_.plan(columns)
+        chunks = _iter_source(X, self.pipeline_.source_columns_, self.chunk_size, self.read_kwargs or dict())
+        return _prefetch(chunks, self.prefetch)
+
+    def fit(self, X, y=None):
+        """
+        :param X: pandas dataframe, str path of a parquet or csv file, or list of such paths
+        """
+        self.steps_ = [clone(step) for step in self.steps]
+        self.pipeline_ = LazyPipeline(steps=self.steps_)
+        chunks = self._chunks(X)
+        for step in self.pipeline_.plan_:
+            chunks = _stream(step, _fit_stream(step, chunks))
+        for _ in chunks:
+            pass
+        return self
+
+    def iter_transform(self, X):
+        """
+        :param X: pandas dataframe, str path of a parquet or csv file, or list of such paths
+        :return: generator of transformed pandas dataframes, one per chunk
+        """
+        assert hasattr(self, 'steps_'), "call fit before transforming"
+        n_jobs = _effective_jobs(self.n_jobs)
+        if n_jobs == 1 or any(_carries_rows(step) for step in self.pipeline_.plan_):
+            chunks = self._chunks(X)
+            for step in self.pipeline_.plan_:
+                chunks = _stream(step, chunks)
+            yield from chunks
+            return
+
+        pending = deque()
+        try:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                for chunk in self._chunks(X):
+                    shared = SharedFrame(chunk)
+                    pending.append((shared, executor.submit(_run_steps, self.pipeline_.plan_, shared.descriptor())))
+                    if len(pending) > n_jobs:
+                        shared, future = pending.popleft()
+                        with shared:
+                            result = future.result()
+                        yield result
+                while pending:
+                    shared, future = pending.popleft()
+                    with shared:
+                        result = future.result()
+                    yield result
+        finally:
+            for shared, future in pending:
+                future.cancel()
+                shared.close()
+
+    def transform(self, X, y=None):
+        """
+        :param X: pandas dataframe, str path of a parquet or csv file, or list of such paths
+        :return: pandas dataframe, all the transformed chunks together, only for output that fits in memory
+        """
+        return pd.concat(self.iter_transform(X))
+
+    def write(self, X, path):
+        """
+        Transforms X chunk by chunk and appends each chunk to a parquet file
+        :param X: pandas dataframe, str path of a parquet or csv file, or list of such paths
+        :param path: str, path of the parquet file to write
+        :return: int, number of rows written
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        rows = 0
+        try:
+            for chunk in self.iter_transform(X):
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
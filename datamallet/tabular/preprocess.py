@@ -1,14 +1,38 @@
+import re
+import numpy as np
 import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 from .utils import (check_columns,
-                    check_dataframe,)
+                    check_dataframe,
+                    downcast_dtype,
+                    extract_object_cols,
+                    infer_datetime_format,)
+from .parallel import parallel_apply
+
+
+def _project(X, positions):
+    """
+    Dataframe holding the columns of X at positions, every column is a view of the column of X
+    instead of a copy, so the cost does not grow with the number of columns left out
+    :param X: pandas dataframe
+    :param positions: list or numpy array of column positions
+    :return: pandas dataframe
+    """
+    projected = pd.DataFrame({j: X.iloc[:, position] for j, position in enumerate(positions)},
+                             index=X.index,
+                             copy=False)
+    projected.columns = X.columns[positions]
+    projected.attrs = dict(X.attrs)
+    return projected
 
 
 class ColumnDropper(BaseEstimator, TransformerMixin):
     def __init__(self,
                  column_list):
         """
-        This class drops columns from a dataframe, this operation is done inplace.
+        This class drops columns from a dataframe, the columns that are kept are not copied.
+        The output shares memory with X, so writing into it in place (eg out.loc[0, 'A'] = 1) also changes X,
+        call .copy() on the output before modifying it in place.
 
         :param column_list: list which contains the names of columns in the dataframe to be dropped
 
@@ -38,10 +62,20 @@ class ColumnDropper(BaseEstimator, TransformerMixin):
         assert (isinstance(X, pd.DataFrame)), 'X needs to be a pandas dataframe'
         return self
 
+    def get_feature_names_out(self, input_features=None):
+        """
+        Columns left after dropping, a reader can load only these columns from a file
+        :param input_features: list of the column names of the input, eg the schema of a parquet file
+        :return: numpy array of column names
+        """
+        assert input_features is not None, "input_features is needed to know which columns are kept"
+        dropped = set(self.column_list)
+        return np.asarray([col for col in input_features if col not in dropped], dtype=object)
+
     def transform(self, X, y=None):
         if check_columns(X, self.column_list) and check_dataframe(X):
-            X = X.copy()
-            X.drop(labels=self.column_list, inplace=True, axis=1)
+            dropped = set(self.column_list)
+            X = _project(X, [position for position, col in enumerate(X.columns) if col not in dropped])
         return X
 
 
@@ -89,25 +123,39 @@ class FunctionMapper(BaseEstimator, TransformerMixin):
                  func,
                  axis='columns',
                  new_col_name=None,
-                 col_name=None):
+                 col_name=None,
+                 vectorized=False,
+                 n_jobs=None):
         """
         Rename columns in place
         :param func: python function to be applied on dataframe.
         :param axis: str, axis to apply the function.
         :param new_col_name: str, column name of new column.
         :param col_name: str, column name to apply.
+        :param vectorized: bool, if True func is called once with whole columns instead of once per row,
+                it gets the column col_name as a pandas series, or the dataframe when col_name is None,
+                eg lambda row: row['A'] + row['B'] works on both a row and a dataframe.
+        :param n_jobs: int, number of processes used to apply a row-wise func, -1 uses every cpu.
+                The rows are split into chunks and the numeric columns are shared with the processes
+                through shared memory. func must be picklable eg defined at module level, not a lambda.
+                Ignored when vectorized is True.
 
         Usage
         >>> from datamallet.tabular.preprocess import FunctionMapper
         >>> import pandas as pd
         >>> df = pd.DataFrame({'A':[1,2,3,4,5],'B':[2,4,6,8,10],'D':['male','male','male','female','female'],'E':[True,True,False,True,True]})
 
+        >>> mapper = FunctionMapper(func=lambda row: row['A'] * row['B'], new_col_name='AB', vectorized=True)
+        >>> print(mapper.transform(X=df)['AB'].tolist())
+        [2, 8, 18, 32, 50]
 
         """
         self.func = func
         self.axis = axis
         self.col_name = col_name
         self.new_col_name = new_col_name
+        self.vectorized = vectorized
+        self.n_jobs = n_jobs
 
     def fit(self, X, y=None):
         assert self.axis in ['columns', 'index']
@@ -116,10 +164,16 @@ class FunctionMapper(BaseEstimator, TransformerMixin):
     def transform(self, X, y=None):
         if check_dataframe(df=X):
             X = X.copy()
-            if self.col_name is None:
-                X[self.new_col_name] = X.apply(self.func, axis=self.axis)
-            if check_columns(df=X,column_list=[self.col_name]):
-                X[self.new_col_name] = X[self.col_name].apply(self.func)
+            if self.vectorized:
+                X[self.new_col_name] = self.func(X if self.col_name is None else X[self.col_name])
+            elif self.n_jobs is not None and self.axis == 'columns' and \
+                    (self.col_name is None or check_columns(df=X, column_list=[self.col_name])):
+                X[self.new_col_name] = parallel_apply(X=X, func=self.func, col_name=self.col_name, n_jobs=self.n_jobs)
+            else:
+                if self.col_name is None:
+                    X[self.new_col_name] = X.apply(self.func, axis=self.axis)
+                if check_columns(df=X,column_list=[self.col_name]):
+                    X[self.new_col_name] = X[self.col_name].apply(self.func)
 
         return X
 
@@ -129,7 +183,9 @@ class ColumnSelector(BaseEstimator, TransformerMixin):
                  column_list
                  ):
         """
-        Selects certain columns in a dataframe
+        Selects certain columns in a dataframe, the selected columns are not copied.
+        The output shares memory with X, so writing into it in place (eg out.loc[0, 'A'] = 1) also changes X,
+        call .copy() on the output before modifying it in place.
         :param column_list: list of column names.
 
         Usage
@@ -144,16 +200,292 @@ class ColumnSelector(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
         return self
 
+    def get_feature_names_out(self, input_features=None):
+        """
+        Selected columns, a reader can load only these columns from a file
+        :param input_features: ignored, present for scikit-learn compatibility
+        :return: numpy array of column names
+        """
+        return np.asarray(self.column_list, dtype=object)
+
     def transform(self, X, y=None):
         if check_dataframe(df=X):
-            X = X.copy()
-
             if check_columns(df=X,column_list=self.column_list):
-                X= X.loc[:,self.column_list]
+                if X.columns.is_unique:
+                    X = _project(X, X.columns.get_indexer(self.column_list))
+                else:
+                    X = X.loc[:,self.column_list]
 
         return X
 
 
+def _rebuild(X, columns):
+    """
+    Dataframe with the columns and index of X from a dictionary of column position to series,
+    the series are not copied
+    """
+    rebuilt = pd.DataFrame(columns, index=X.index, copy=False)
+    rebuilt.columns = X.columns
+    rebuilt.attrs = dict(X.attrs)
+    return rebuilt
+
+
+def _categories(series):
+    """
+    Distinct values present in series, sorted when they can be compared
+    """
+    values = series.dropna().unique()
+    try:
+        return sorted(values)
+    except TypeError:
+        return list(values)
+
+
+def _holds(series, dtype, lossless_float):
+    """
+    Whether converting series to the dtype chosen during fit keeps every value, a column whose kind changed
+    since fit (eg integers that now hold floats or missing values) or that holds values not seen in fit
+    (for categories) does not
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        return bool((series.isin(dtype.categories) | series.isna()).all())
+    if series.dtype.kind != dtype.kind:
+        return False
+    if dtype.kind in 'iu':
+        return len(series) == 0 or (np.iinfo(dtype).min <= series.min() and series.max() <= np.iinfo(dtype).max)
+    return downcast_dtype(series, lossless_float=lossless_float) is not None
+
+
+class MemoryOptimizer(BaseEstimator, TransformerMixin):
+    def __init__(self,
+                 column_list=None,
+                 category_ratio=0.5,
+                 lossless_float=True):
+        """
+        Shrinks the dtypes of a dataframe so later transformers move less memory. fit picks the smallest
+        dtype for every column from its min, max and number of distinct values: integers get the smallest
+        integer dtype of the same signedness, float64 becomes float32 and object columns with few distinct
+        values become category. The categories are fixed in fit, so every batch transformed comes out with
+        the same categorical dtype and batches can be concatenated. partial_fit widens the dtypes batch by
+        batch, so a dtype fitted on every batch of a large file holds all of them. transform converts the columns, the other
+        columns are not copied. A column whose values in transform no longer fit the dtype chosen in fit
+        (eg an integer out of range, an integer column that now holds floats or missing values, or a value
+        not seen in fit) is left as it is. The bytes saved by the last transform are in bytes_saved_.
+
+        :param column_list: list of column names to shrink, None shrinks every column
+        :param category_ratio: float, object columns with at most category_ratio * number of rows
+                distinct values become category
+        :param lossless_float: bool, when True float64 becomes float32 only if no value changes
 
+        Usage
+        >>> from datamallet.tabular.preprocess import MemoryOptimizer
+        >>> import pandas as pd
+        >>> df = pd.DataFrame({'A':[1,2,3,4,5],'B':[2.5,4,6,8,10],'C':['dog','cat', 'sheep','dog','cat'],
+        ... 'D':['male','male','male','female','female']})
+
+        >>> optimizer = MemoryOptimizer()
+        >>> df_o = optimizer.fit_transform(X=df)
+        >>> optimizer.dtypes_
+        {'A': dtype('int8'), 'B': dtype('float32'), 'D': CategoricalDtype(categories=['female', 'male'], ordered=False)}
+
+        """
+        self.column_list = column_list
+        self.category_ratio = category_ratio
+        self.lossless_float = lossless_float
+        assert column_list is None or isinstance(column_list, list), "column_list must be None or a list"
+        assert 0 <= category_ratio <= 1, "category_ratio must be between 0 and 1"
 
+    def fit(self, X, y=None):
+        for attribute in ['dtypes_', 'source_dtypes_', 'n_rows_']:
+            if hasattr(self, attribute):
+                delattr(self, attribute)
+        return self.partial_fit(X)
+
+    def _widen(self, series, previous):
+        """
+        Smallest dtype that holds the values of series and of the batches fitted before (previous),
+        None when there is none
+        """
+        if series.dtype == object:
+            try:
+                categories = _categories(series)
+                if previous is not None:
+                    categories = _categories(pd.Series(list(previous.categories) + categories, dtype=object))
+            except TypeError:  # unhashable values such as lists
+                return None
+            return pd.CategoricalDtype(categories) if len(categories) <= self.category_ratio * self.n_rows_ else None
+        dtype = downcast_dtype(series, lossless_float=self.lossless_float)
+        return dtype if dtype is None or previous is None else np.promote_types(previous, dtype)
+
+    def partial_fit(self, X, y=None):
+        """
+        Widens the dtypes chosen so far so they also hold the values of a batch: integers get the dtype holding
+        the min and max of every batch, float32 is kept if every batch fits it and the categories are the
+        distinct values of every batch. A column whose dtype differs between batches is left as it is.
+        :param X: pandas dataframe
+        """
+        assert check_dataframe(X), "X must be a pandas dataframe"
+        columns = list(X.columns) if self.column_list is None else self.column_list
+        assert check_columns(df=X, column_list=columns), "column_list must be columns of X"
+        if not hasattr(self, 'dtypes_'):
+            self.dtypes_ = dict()
+            self.source_dtypes_ = dict()
+            self.n_rows_ = 0
+        if len(X) == 0:
+            return self
+
+        self.n_rows_ += len(X)
+        for col in columns:
+            series = X[col]
+            first = col not in self.source_dtypes_
+            if first:
+                self.source_dtypes_[col] = series.dtype
+            elif self.source_dtypes_[col] != series.dtype:
+                self.source_dtypes_[col] = None
+            dtype = None
+            if self.source_dtypes_[col] is not None and (first or col in self.dtypes_):
+                dtype = self._widen(series, self.dtypes_.get(col))
+            if dtype is None:
+                self.dtypes_.pop(col, None)
+            else:
+                self.dtypes_[col] = dtype
+        return self
+
+    def transform(self, X, y=None):
+        assert hasattr(self, 'dtypes_'), "call fit before transforming"
+        assert check_dataframe(X), "X must be a pandas dataframe"
+
+        columns = dict()
+        self.bytes_before_ = 0
+        self.bytes_after_ = 0
+        for position, col in enumerate(X.columns):
+            series = X.iloc[:, position]
+            dtype = self.dtypes_.get(col)
+            if dtype is not None and series.dtype != dtype and _holds(series, dtype, self.lossless_float):
+                converted = series.astype(dtype)
+                self.bytes_before_ += series.memory_usage(index=False, deep=True)
+                self.bytes_after_ += converted.memory_usage(index=False, deep=True)
+                series = converted
+            columns[position] = series
+
+        self.bytes_saved_ = self.bytes_before_ - self.bytes_after_
+        return _rebuild(X, columns)
+
+
+# strings read as booleans by TypeInferrer, compared after stripping and lower casing
+BOOLEAN_STRINGS = {'true': True, 'false': False, 't': True, 'f': False,
+                   'yes': True, 'no': False, 'y': True, 'n': False}
+
+# numbers written with leading zeros (eg zip codes 02139) that TypeInferrer keeps as strings
+LEADING_ZERO = re.compile(r'\s*[-+]?0\d')
+
+
+def _parse(series, parser, datetime_format=None):
+    """
+    Converts a whole column with a single vectorized call, values that do not parse become missing
+    """
+    if parser == 'numeric':
+        # zero padded codes such as zip codes stay strings, parsing them would drop the leading zeros
+        padded = series.map(lambda value: isinstance(value, str) and LEADING_ZERO.match(value) is not None)
+        return pd.to_numeric(series, errors='coerce').mask(padded)
+    if parser == 'boolean':
+        parsed = series.astype(str).str.strip().str.lower().map(BOOLEAN_STRINGS).where(series.notna())
+        return parsed.astype('boolean') if parsed.isna().any() else parsed.astype(bool)
+    return pd.to_datetime(series, format=datetime_format, errors='coerce')
+
+
+def _failure_rate(series, parsed):
+    """
+    Share of the values present in series that became missing when parsed
+    """
+    present = series.notna()
+    n_present = present.sum()
+    return 0.0 if n_present == 0 else (parsed.isna() & present).sum() / n_present
+
+
+class TypeInferrer(BaseEstimator, TransformerMixin):
+    def __init__(self,
+                 column_list=None,
+                 sample_size=100,
+                 max_failure_rate=0.01):
+        """
+        Converts object columns holding numbers, booleans or dates stored as strings to numeric, boolean and
+        datetime columns, so they are no longer treated as categorical. fit tries a strided sample of each
+        object column with the boolean (true/false, yes/no, t/f, y/n), numeric and datetime parsers and keeps
+        the first one that parses all but max_failure_rate of the sample, for dates the format is inferred
+        once with infer_datetime_format and reused. Strings with leading zeros (eg zip codes 02139) do not
+        count as numbers, so such columns stay strings. transform converts each column with one vectorized call,
+        a column where more than max_failure_rate of the values do not parse is left as it is and listed
+        in skipped_columns_. The other columns are not copied.
+
+        :param column_list: list of object columns to convert, None tries every object column
+        :param sample_size: int, number of values of each column tried in fit
+        :param max_failure_rate: float, largest share of values that may fail to parse and become missing
+
+        Usage
+        >>> from datamallet.tabular.preprocess import TypeInferrer
+        >>> import pandas as pd
+        >>> df = pd.DataFrame({'A':['1','2','3.5'],'B':['2019-01-02','2019-01-03','2019-01-24'],
+        ... 'C':['dog','cat', 'sheep'],'D':['yes','no','yes']})
+
+        >>> inferrer = TypeInferrer()
+        >>> df_t = inferrer.fit_transform(X=df)
+        >>> inferrer.parsers_
+        {'A': ('numeric', None), 'B': ('datetime', '%Y-%m-%d'), 'D': ('boolean', None)}
+
+        """
+        self.column_list = column_list
+        self.sample_size = sample_size
+        self.max_failure_rate = max_failure_rate
+        assert column_list is None or isinstance(column_list, list), "column_list must be None or a list"
+        assert isinstance(sample_size, int) and sample_size > 0, "sample_size must be a positive integer"
+        assert 0 <= max_failure_rate < 1, "max_failure_rate must be between 0 and 1"
+
+    def _infer(self, series):
+        """
+        Parser and datetime format for a column, None when no parser fits its sample
+        """
+        sample = series.iloc[::max(len(series) // self.sample_size, 1)].dropna()
+        if len(sample) == 0:
+            return None
+
+        for parser in ['boolean', 'numeric']:
+            if _failure_rate(sample, _parse(sample, parser)) <= self.max_failure_rate:
+                return parser, None
+
+        datetime_format = infer_datetime_format(sample, sample_size=self.sample_size,
+                                                max_failure_rate=self.max_failure_rate)
+        if datetime_format is not None:
+            return 'datetime', datetime_format
+        return None
+
+    def fit(self, X, y=None):
+        assert check_dataframe(X), "X must be a pandas dataframe"
+        columns = extract_object_cols(df=X) if self.column_list is None else self.column_list
+        assert check_columns(df=X, column_list=columns), "column_list must be columns of X"
+
+        self.parsers_ = dict()
+        for col in columns:
+            parser = self._infer(X[col])
+            if parser is not None:
+                self.parsers_[col] = parser
+        return self
+
+    def transform(self, X, y=None):
+        assert hasattr(self, 'parsers_'), "call fit before transforming"
+        assert check_dataframe(X), "X must be a pandas dataframe"
+
+        columns = dict()
+        self.skipped_columns_ = list()
+        for position, col in enumerate(X.columns):
+            series = X.iloc[:, position]
+            if col in self.parsers_ and series.dtype == object:
+                parsed = _parse(series, *self.parsers_[col])
+                if _failure_rate(series, parsed) <= self.max_failure_rate:
+                    series = parsed
+                else:
+                    self.skipped_columns_.append(col)
+            columns[position] = series
+
+        return _rebuild(X, columns)
 
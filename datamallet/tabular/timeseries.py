@@ -1,9 +1,265 @@
-from .utils import check_dataframe, time_index
+from collections import deque
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+from .utils import (check_dataframe, time_index, check_columns, sorted_time_index,
+                    infer_datetime_format)
 from sklearn.base import BaseEstimator, TransformerMixin
 
+NANOSECONDS_PER_DAY = 86400 * 10 ** 9
+
+
+def _fixed_frequency(rule):
+    """
+    Length of a resampling rule in nanoseconds
+    :param rule: str, or date offset
+    :return: int, number of nanoseconds in rule, or None if rule is not of fixed length (eg 1M)
+    """
+    offset = to_offset(rule)
+    if isinstance(offset, Tick):
+        return offset.nanos
+    return None
+
+
+def _epoch_nanos(index):
+    """
+    int64 nanoseconds since the epoch for a timezone naive DatetimeIndex
+    :param index: pandas DatetimeIndex
+    :return: numpy int64 array, or None if the index is timezone aware
+    """
+    if index.tz is not None:
+        return None
+    return np.asarray(index.values).view('i8')
+
+
+def _quantile_of(aggregation_method):
+    """
+    Quantile represented by an aggregation name
+    :param aggregation_method: str, eg median or quantile(0.95)
+    :return: float between 0 and 1, or None if aggregation_method is not a quantile
+    """
+    if aggregation_method == 'median':
+        return 0.5
+    if isinstance(aggregation_method, str) and aggregation_method.startswith('quantile(') \
+            and aggregation_method.endswith(')'):
+        try:
+            q = float(aggregation_method[len('quantile('):-1])
+        except ValueError:
+            return None
+        if 0 <= q <= 1:
+            return q
+    return None
+
+
+def _bucket_reduce(codes, values, stats):
+    """
+    Reduces the rows of values that share the same bucket code in a single pass.
+    Rows are sorted by code only when codes are not already monotonic,
+    each statistic is then a segment reduction over the sorted rows.
+    :param codes: numpy int64 array, bucket code of each row
+    :param values: 2-D float64 numpy array of shape (rows, columns)
+    :param stats: list of statistics to compute, from count, sum, sumsq, m2, min, max, first, last
+                or quantiles written as median or quantile(q)
+    :return: tuple of the sorted unique codes and a dictionary mapping statistic to
+            a 2-D numpy array of shape (unique codes, columns)
+    """
+    if codes.size == 0:
+        return codes, {stat: np.empty((0, values.shape[1])) for stat in stats}
+
+    if codes.size > 1 and (codes[1:] < codes[:-1]).any():
+        order = np.argsort(codes, kind='mergesort')
+        codes = codes[order]
+        values = values[order]
+
+    n_rows = codes.size
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, n_rows])
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    count = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+    total = np.add.reduceat(filled, starts, axis=0)
+
+    reduced = dict()
+    for stat in stats:
+        if stat == 'count':
+            reduced[stat] = count
+        elif stat == 'sum':
+            reduced[stat] = total
+        elif stat == 'sumsq':
+            reduced[stat] = np.add.reduceat(filled * filled, starts, axis=0)
+        elif stat == 'm2':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.repeat(total / count, lengths, axis=0)
+            deviation = np.where(valid, values - mean, 0.0)
+            reduced[stat] = np.add.reduceat(deviation * deviation, starts, axis=0)
+        elif stat == 'min':
+            reduced[stat] = np.fmin.reduceat(values, starts, axis=0)
+        elif stat == 'max':
+            reduced[stat] = np.fmax.reduceat(values, starts, axis=0)
+        elif stat in ['first', 'last']:
+            # position of the first (last) non missing row of each bucket
+            rows = np.arange(n_rows)[:, None]
+            if stat == 'first':
+                position = np.minimum.reduceat(np.where(valid, rows, n_rows), starts, axis=0)
+            else:
+                position = np.maximum.reduceat(np.where(valid, rows, -1), starts, axis=0)
+            result = np.take_along_axis(values, np.clip(position, 0, n_rows - 1), axis=0)
+            reduced[stat] = np.where(count > 0, result, np.nan)
+        elif _quantile_of(stat) is not None:
+            q = _quantile_of(stat)
+            segment = np.repeat(np.arange(starts.size), lengths)
+            result = np.empty(count.shape)
+            for j in range(values.shape[1]):
+                # missing values sort to the end of each bucket
+                ordered = values[np.lexsort((values[:, j], segment)), j]
+                position = starts + q * (count[:, j] - 1)
+                lower = np.clip(np.floor(position).astype(np.int64), 0, n_rows - 1)
+                upper = np.clip(np.ceil(position).astype(np.int64), 0, n_rows - 1)
+                result[:, j] = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+            reduced[stat] = np.where(count > 0, result, np.nan)
+
+    return codes[starts], reduced
+
+
+def _finalize_moments(stat_dict, aggregation_method):
+    """
+    Turns partial aggregates into the requested aggregation
+    :param stat_dict: dictionary mapping statistic name (count, sum, sumsq or m2, min, max) to 2-D numpy array
+    :param aggregation_method: str, one of mean, std, var, min, max, sum, count
+    :return: 2-D numpy array
+    """
+    if aggregation_method in ['min', 'max', 'sum']:
+        return stat_dict[aggregation_method]
+
+    count = stat_dict['count']
+    if aggregation_method == 'count':
+        return count.astype(np.int64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, stat_dict['sum'] / count, np.nan)
+        if aggregation_method == 'mean':
+            return mean
+        if 'm2' in stat_dict:
+            m2 = stat_dict['m2']
+        else:
+            m2 = np.maximum(stat_dict['sumsq'] - count * mean * mean, 0.0)
+        variance = np.where(count > 1, m2 / (count - 1), np.nan)
+    if aggregation_method == 'var':
+        return variance
+    return np.sqrt(variance)
+
+
+def _densify(codes, stat_dict, first_code, n_buckets):
+    """
+    Scatters the statistics of the occupied buckets into the full range of buckets,
+    empty buckets count and sum to 0, every other statistic is missing.
+    """
+    positions = codes - first_code
+    full = dict()
+    for stat, array in stat_dict.items():
+        full[stat] = np.zeros((n_buckets, array.shape[1])) if stat in ['count','sum','sumsq','m2'] \
+            else np.full((n_buckets, array.shape[1]), np.nan)
+        full[stat][positions] = array
+    return full
+
+
+def _panel_positions(keys, n_time):
+    """
+    Lays out the occupied (entity, time bucket) keys of a panel the way groupby(entity).resample() does,
+    every entity gets the full range of buckets between its own first and last occupied bucket.
+    :param keys: sorted unique numpy int64 array, entity code * n_time + time bucket code
+    :param n_time: int, number of time buckets spanned by the whole panel
+    :return: tuple of the dense position of each key, and the entity code and time bucket code of every dense row
+    """
+    entity = keys // n_time
+    bucket = keys % n_time
+    entity_starts = np.flatnonzero(np.r_[True, entity[1:] != entity[:-1]])
+    entity_ends = np.r_[entity_starts[1:], keys.size] - 1
+    lowest = bucket[entity_starts]
+    lengths = bucket[entity_ends] - lowest + 1
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+
+    key_entity = np.repeat(np.arange(entity_starts.size), np.diff(np.r_[entity_starts, keys.size]))
+    positions = offsets[key_entity] + bucket - lowest[key_entity]
+    dense_entity = np.repeat(entity[entity_starts], lengths)
+    dense_bucket = np.repeat(lowest - offsets, lengths) + np.arange(lengths.sum())
+    return positions, dense_entity, dense_bucket
+
+
+def _bucket_frame(full, pairs, used_columns, dtypes, index, columns):
+    """
+    Builds the resampled dataframe from dense bucket statistics
+    :param full: dictionary mapping statistic name to 2-D numpy array of shape (buckets, used columns)
+    :param pairs: list of (column name, aggregation) pairs in output order
+    :param used_columns: list of column names, the column order of the arrays in full
+    :param dtypes: dictionary mapping column name to its dtype in the input
+    :param index: pandas DatetimeIndex of the buckets
+    :param columns: pandas Index of the output columns
+    :return: pandas dataframe
+    """
+    col_position = {col: j for j, col in enumerate(used_columns)}
+    results = list()
+    for col, name in pairs:
+        j = col_position[col]
+        integer = pd.api.types.is_integer_dtype(dtypes[col])
+        if name == 'ohlc':
+            parts = [full['first'][:, j], full['max'][:, j], full['min'][:, j], full['last'][:, j]]
+        elif name in ['mean', 'std', 'var', 'count']:
+            parts = [_finalize_moments({stat: array[:, j] for stat, array in full.items()}, name)]
+        else:
+            parts = [full[name][:, j]]
+
+        for part in parts:
+            # keep integer columns integer when there is nothing missing, like pandas
+            if integer and name in ['sum','min','max','first','last','ohlc'] and not np.isnan(part).any():
+                part = part.astype(np.int64)
+            results.append(part)
+
+    bucket_frame = pd.DataFrame(dict(enumerate(results)), index=index)
+    bucket_frame.columns = columns
+    return bucket_frame
+
+
+def _merge_moments(codes, stat_dict, factor):
+    """
+    Merges the mergeable aggregates of consecutive buckets into buckets factor times as long,
+    variances are combined with the parallel form of Welford's algorithm.
+    :param codes: sorted numpy int64 array of bucket codes
+    :param stat_dict: dictionary mapping count, sum, min, max and m2 to 2-D numpy arrays
+    :param factor: int, number of buckets merged into one
+    :return: tuple of the merged codes and the merged statistics
+    """
+    parents = codes // factor
+    starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+    lengths = np.diff(np.r_[starts, parents.size])
+
+    count = stat_dict['count']
+    total = stat_dict['sum']
+    merged = {'count': np.add.reduceat(count, starts, axis=0),
+              'sum': np.add.reduceat(total, starts, axis=0),
+              'min': np.fmin.reduceat(stat_dict['min'], starts, axis=0),
+              'max': np.fmax.reduceat(stat_dict['max'], starts, axis=0)}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        child_mean = total / count
+        parent_mean = np.repeat(merged['sum'] / merged['count'], lengths, axis=0)
+    deviation = np.where(count > 0, child_mean - parent_mean, 0.0)
+    merged['m2'] = np.add.reduceat(stat_dict['m2'] + count * deviation * deviation, starts, axis=0)
+
+    return parents[starts], merged
+
 
 class Resampler(BaseEstimator,TransformerMixin):
-    def __init__(self, rule, aggregation_method='mean'):
+    aggregations = ['mean','std','var','min','max','sum','count','first','last','ohlc','median']
+
+    # statistics computed by _bucket_reduce for each aggregation
+    required_statistics = {'mean':['sum','count'],
+                           'std':['sum','m2','count'],
+                           'var':['sum','m2','count'],
+                           'ohlc':['first','max','min','last']}
+
+    def __init__(self, rule, aggregation_method='mean', group_by=None, long_format=False):
         """
         Resampler is a transformer for changing the frequency of the data.
         :param rule: str, or date offset representing the target resolution
@@ -19,7 +275,18 @@ class Resampler(BaseEstimator,TransformerMixin):
 
                     more info here https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#dateoffset-objects
 
-        :param aggregation_method:str, aggregation method, one of mean, std, max, min, sum
+        :param aggregation_method:str, list or dictionary, aggregation method, one of mean, std, var, max, min, sum,
+                count, first, last, ohlc, median or quantile(q) eg quantile(0.95).
+                A list applies every aggregation to every column, a dictionary maps column names to an
+                aggregation or a list of aggregations. All aggregations are computed from a single assignment
+                of rows to buckets, for fixed frequency rules on a timezone naive index each one is a segment
+                reduction over the integer bucket codes. Other rules are passed on to pandas.
+        :param group_by: str, name of a column holding an entity id eg a device id, when given every entity is
+                resampled separately like groupby(group_by).resample(rule) but in a single reduction over a
+                combined (entity, time bucket) integer key, without a Python call per entity.
+                The output is indexed by (entity, time).
+        :param long_format: bool, only used with group_by, if True entity and time are returned as ordinary
+                columns instead of the index
 
         Usage
         >>> import pandas as pd
@@ -40,30 +307,236 @@ class Resampler(BaseEstimator,TransformerMixin):
         2018-01-01     28.000  43.791667
         2018-01-02     13.875  13.875000
 
+        >>> resampler = Resampler(rule='24H', aggregation_method={'price':'ohlc', 'volume':['sum','quantile(0.9)']})
+        >>> df_r = resampler.transform(X=df)
+        >>> print(df_r)
+                      price                   volume
+                       open high low close    sum quantile(0.9)
+        week_starting
+        2018-01-01       10  100   9    10   1051         100.0
+        2018-01-02       11   19   9    10    111          18.3
+
         """
         self.rule = rule
         self.aggregation_method = aggregation_method
+        self.group_by = group_by
+        self.long_format = long_format
         assert isinstance(rule, str), "rule must be a string"
-        assert aggregation_method in ['mean','std','min','max','sum']
+        assert isinstance(aggregation_method, (str, list, dict)), "aggregation_method must be a string, list or dictionary"
+        assert group_by is None or isinstance(group_by, str), "group_by must be None or a column name"
+        assert isinstance(long_format, bool), "long_format must be a boolean"
+        for aggregation in self._aggregation_names():
+            assert aggregation in self.aggregations or _quantile_of(aggregation) is not None, \
+                "aggregation_method must be one of {} or quantile(q)".format(self.aggregations)
+
+    def _aggregation_names(self):
+        if isinstance(self.aggregation_method, dict):
+            names = list()
+            for aggregation in self.aggregation_method.values():
+                names.extend(aggregation if isinstance(aggregation, list) else [aggregation])
+            return names
+        if isinstance(self.aggregation_method, list):
+            return self.aggregation_method
+        return [self.aggregation_method]
+
+    def _aggregation_pairs(self, X):
+        """
+        list of (column name, aggregation) pairs in output order
+        """
+        if isinstance(self.aggregation_method, dict):
+            pairs = list()
+            for col, aggregation in self.aggregation_method.items():
+                for name in (aggregation if isinstance(aggregation, list) else [aggregation]):
+                    pairs.append((col, name))
+            return pairs
+        return [(col, name) for col in X.columns if col != self.group_by for name in self._aggregation_names()]
+
+    def _flat_output(self):
+        if isinstance(self.aggregation_method, list):
+            return False
+        names = self._aggregation_names()
+        if isinstance(self.aggregation_method, dict) and \
+                any(isinstance(aggregation, list) for aggregation in self.aggregation_method.values()):
+            return False
+        return 'ohlc' not in names
+
+    def _output_columns(self, pairs):
+        if self._flat_output():
+            return pd.Index([col for col, name in pairs])
+        columns = list()
+        for col, name in pairs:
+            if name == 'ohlc':
+                columns.extend([(col, part) for part in ['open','high','low','close']])
+            else:
+                columns.append((col, name))
+        return pd.MultiIndex.from_tuples(columns)
+
+    def _pandas_resample(self, X, pairs):
+        """
+        Resampling through pandas, used when the rule is not of fixed length,
+        the index is timezone aware or a column is not numeric.
+        """
+        if self.group_by is None:
+            resampled = X.resample(rule=self.rule)
+        else:
+            resampled = X.drop(columns=self.group_by).groupby(X[self.group_by]).resample(rule=self.rule)
+
+        if isinstance(self.aggregation_method, str):
+            q = _quantile_of(self.aggregation_method)
+            if self.aggregation_method == 'ohlc':
+                return resampled.ohlc()
+            if q is not None:
+                return resampled.quantile(q)
+            return resampled.agg(self.aggregation_method)
+
+        results = list()
+        for col, name in pairs:
+            q = _quantile_of(name)
+            if name == 'ohlc':
+                part = resampled[col].ohlc()
+                results.extend(part[c] for c in part.columns)
+            elif q is not None:
+                results.append(resampled[col].quantile(q))
+            else:
+                results.append(resampled[col].agg(name))
+
+        resampled_x = pd.concat(results, axis=1)
+        resampled_x.columns = self._output_columns(pairs)
+        return resampled_x
 
     def fit(self, X, y=None):
         return self
 
     def transform(self, X, y=None):
-        X = X.copy()
         if check_dataframe(X) and time_index(X):
-            resampled_x = X.resample(rule=self.rule).agg(self.aggregation_method)
-            return resampled_x
+            pairs = self._aggregation_pairs(X)
+            used_columns = list(dict.fromkeys(col for col, name in pairs))
+            step = _fixed_frequency(self.rule)
+            nanos = _epoch_nanos(X.index)
+            numeric = X.loc[:, used_columns].select_dtypes(include='number').shape[1] == len(used_columns)
+
+            if step is None or nanos is None or len(X) == 0 or not numeric:
+                resampled_x = self._pandas_resample(X, pairs)
+                return resampled_x.reset_index() if self.group_by is not None and self.long_format else resampled_x
+
+            origin = nanos.min() - nanos.min() % NANOSECONDS_PER_DAY
+            codes = (nanos - origin) // step
+            first_code = codes.min()
+            n_buckets = codes.max() - first_code + 1
+
+            stats = list()
+            for col, name in pairs:
+                stats.extend(self.required_statistics.get(name, [name]))
+            stats = list(dict.fromkeys(stats))
+
+            values = X.loc[:, used_columns].to_numpy(dtype=np.float64)
+            if self.group_by is not None:
+                return self._panel_resample(X, codes - first_code, n_buckets, values, stats, pairs, used_columns,
+                                            origin + first_code * step, step)
+
+            bucket_codes, reduced = _bucket_reduce(codes=codes, values=values, stats=stats)
+
+            full = _densify(codes=bucket_codes, stat_dict=reduced, first_code=first_code, n_buckets=n_buckets)
+            index = pd.DatetimeIndex(origin + (first_code + np.arange(n_buckets)) * step,
+                                     name=X.index.name,
+                                     freq=self.rule)
+            return _bucket_frame(full=full,
+                                 pairs=pairs,
+                                 used_columns=used_columns,
+                                 dtypes=dict(X.dtypes),
+                                 index=index,
+                                 columns=self._output_columns(pairs))
 
         else:
             return X
 
+    def _panel_resample(self, X, codes, n_buckets, values, stats, pairs, used_columns, start, step):
+        """
+        Resamples every entity of a panel with one reduction over the combined (entity, time bucket) key
+        :param codes: numpy int64 array, time bucket of each row counted from the first bucket of the panel
+        :param n_buckets: int, number of time buckets spanned by the panel
+        :param start: int, first bucket of the panel in nanoseconds since the epoch
+        :param step: int, length of a bucket in nanoseconds
+        """
+        entity_codes, entities = pd.factorize(X[self.group_by], sort=True)
+        # rows without an entity are dropped, like groupby does
+        present = entity_codes >= 0
+        if not present.all():
+            codes, values, entity_codes = codes[present], values[present], entity_codes[present]
+
+        keys, reduced = _bucket_reduce(codes=entity_codes.astype(np.int64) * n_buckets + codes,
+                                       values=values,
+                                       stats=stats)
+        positions, dense_entity, dense_bucket = _panel_positions(keys, n_buckets)
+        full = _densify(codes=positions, stat_dict=reduced, first_code=0, n_buckets=dense_entity.size)
+        index = pd.MultiIndex.from_arrays([entities.take(dense_entity),
+                                           pd.DatetimeIndex(start + dense_bucket * step, name=X.index.name)],
+                                          names=[self.group_by, X.index.name])
+        resampled_x = _bucket_frame(full=full,
+                                    pairs=pairs,
+                                    used_columns=used_columns,
+                                    dtypes=dict(X.dtypes),
+                                    index=index,
+                                    columns=self._output_columns(pairs))
+        return resampled_x.reset_index() if self.long_format else resampled_x
+
+
+def _window_bounds(nanos, window, closed=None):
+    """
+    Positions of the first row and one past the last row of the window ending at each row
+    :param nanos: numpy int64 array of increasing timestamps in nanoseconds
+    :param window: str, fixed length time window, or int, number of rows
+    :param closed: one of None, 'right','left','both','neither', None is 'right'
+    :return: tuple of numpy int64 arrays (start, end) and the minimum number of observations pandas requires
+    """
+    n_rows = len(nanos)
+    if isinstance(window, int):
+        end = np.arange(1, n_rows + 1)
+        return np.maximum(end - window, 0), end, window
+
+    closed = 'right' if closed is None else closed
+    start_side = 'left' if closed in ['left', 'both'] else 'right'
+    start = np.searchsorted(nanos, nanos - _fixed_frequency(window), side=start_side)
+    # the window ends at the row itself, not at its timestamp, so later rows sharing the timestamp are left
+    # out like in pandas, an open right end leaves out the row itself
+    end = np.arange(1, n_rows + 1) if closed in ['right', 'both'] else np.arange(n_rows)
+    return start, end, 1
+
+
+def _window_extreme(values, bounds, func, out):
+    """
+    Rolling min or max for several windows from one sparse table.
+    Level k of the table holds the extreme of every run of 2**k rows, each level is built from
+    the one below it and answers every window whose length needs it before being discarded.
+    :param values: 2-D float64 numpy array of shape (rows, columns)
+    :param bounds: list of (start, end) tuples of numpy arrays, one per window
+    :param func: np.fmin or np.fmax
+    :param out: list of 2-D numpy arrays to write the result of each window into
+    """
+    levels = list()
+    for start, end in bounds:
+        length = end - start
+        levels.append(np.floor(np.log2(np.maximum(length, 1))).astype(np.int64))
+    top_level = max(int(level.max()) for level in levels) if len(values) else -1
+
+    table = values
+    for level in range(top_level + 1):
+        if level > 0:
+            half = 2 ** (level - 1)
+            table = func(table[:-half], table[half:])
+        span = 2 ** level
+        for (start, end), window_level, result in zip(bounds, levels, out):
+            rows = np.flatnonzero((window_level == level) & (end > start))
+            if rows.size:
+                result[rows] = func(table[start[rows]], table[end[rows] - span])
+
 
 class RollingWindow(BaseEstimator,TransformerMixin):
     def __init__(self, window, aggregation_method='mean', center=False, closed=None):
         """
         RollingWindow is a transformer for calculating rolling aggregations for time series data.
-        :param window: str, Size of the moving window.
+        :param window: str, int or list of them, Size of the moving window.
+                    An int is a window of that many rows, a string is a window of that much time.
                     1D represents a day
                     1H represents an hour
                     1T represents a minute
@@ -76,7 +549,15 @@ class RollingWindow(BaseEstimator,TransformerMixin):
 
                     more info here https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#dateoffset-objects
 
-        :param aggregation_method:str, aggregation method, one of mean, std, max, min, sum, var, corr
+                    When a list of windows is given, every window is computed in one pass into a single output
+                    block with columns named <column>_<window>, eg price_1H, price_6H. The windows share one
+                    set of prefix sums (sum, mean, std, var) and one sparse table (min, max), only numeric
+                    columns are kept.
+
+        :param aggregation_method:str, aggregation method, one of mean, std, max, min, sum, var, corr, median
+                or quantile(q) eg quantile(0.95). corr is not available with a list of windows.
+                median and quantile use the indexable skip list kernels of pandas, each step inserts and
+                removes one value in O(log window) for both time and row based windows.
         :param center: boolean, whether to center the result
         :param closed: one of None, 'right','left','both','neither'
         Usage
@@ -134,22 +615,1361 @@ class RollingWindow(BaseEstimator,TransformerMixin):
         self.aggregation_method = aggregation_method
         self.center = center
         self.closed = closed
-        assert isinstance(window, str), "rule must be a string"
-        assert aggregation_method in ['mean','std','min','max','sum','var','corr']
+        assert isinstance(window, (str, int, list)), "window must be a string, an integer or a list of them"
+        assert aggregation_method in ['mean','std','min','max','sum','var','corr','median'] \
+            or _quantile_of(aggregation_method) is not None, "aggregation_method is not supported"
         assert isinstance(center,bool),"center must be a boolean"
         assert closed in [None,'right','left','both','neither']
+        if isinstance(window, list):
+            assert len(window) > 0, "window must not be an empty list"
+            assert all(isinstance(size, (str, int)) for size in window), "every window must be a string or an integer"
+            assert aggregation_method != 'corr', "corr is not available with a list of windows"
 
     def fit(self, X, y=None):
         return self
 
+    def _rolling(self, X, window):
+        """
+        Rolling aggregation of X over a single window through pandas
+        """
+        rolling = X.rolling(window=window,
+                            center=self.center,
+                            axis=0,
+                            closed=self.closed)
+        q = _quantile_of(self.aggregation_method)
+        if q is not None:
+            return rolling.quantile(q)
+        return rolling.agg(self.aggregation_method)
+
+    def _multiple_windows(self, X):
+        """
+        Computes every window in self.window into one preallocated block
+        """
+        columns = list(X.select_dtypes(include='number').columns)
+        n_columns = len(columns)
+        names = ['{}_{}'.format(col, size) for col in columns for size in self.window]
+        block = np.full((len(X), n_columns * len(self.window)), np.nan)
+
+        # the columns of window k in the block, the block is ordered by column then window
+        positions = [np.arange(n_columns) * len(self.window) + k for k in range(len(self.window))]
+
+        nanos = np.asarray(X.index.asi8)
+        time_windows = [size for size in self.window if isinstance(size, str)]
+        fast = not self.center \
+            and self.aggregation_method in ['mean','std','min','max','sum','var'] \
+            and all(_fixed_frequency(size) is not None for size in time_windows) \
+            and (len(time_windows) == len(self.window) or self.closed in [None, 'right']) \
+            and sorted_time_index(X)
+
+        if not fast:
+            for size, position in zip(self.window, positions):
+                block[:, position] = self._rolling(X.loc[:, columns], size).to_numpy()
+            return pd.DataFrame(block, index=X.index, columns=names)
+
+        values = X.loc[:, columns].to_numpy(dtype=np.float64)
+        bounds = list()
+        minimum_periods = list()
+        for size in self.window:
+            start, end, min_periods = _window_bounds(nanos=nanos, window=size, closed=self.closed)
+            bounds.append((start, end))
+            minimum_periods.append(min_periods)
+
+        valid = ~np.isnan(values)
+        count = np.vstack([np.zeros((1, n_columns)), np.cumsum(valid, axis=0)])
+        window_counts = [count[end] - count[start] for start, end in bounds]
+
+        if self.aggregation_method in ['min', 'max']:
+            results = [np.full(values.shape, np.nan) for _ in self.window]
+            func = np.fmin if self.aggregation_method == 'min' else np.fmax
+            _window_extreme(values=values, bounds=bounds, func=func, out=results)
+        else:
+            # prefix sums of values shifted by the column mean, the shift keeps the sums small
+            shift = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(n_columns)
+            centered = np.where(valid, values - shift, 0.0)
+            prefix = {'sum': np.vstack([np.zeros((1, n_columns)), np.cumsum(centered, axis=0)]),
+                      'sumsq': np.vstack([np.zeros((1, n_columns)), np.cumsum(centered * centered, axis=0)])}
+            results = list()
+            for (start, end), window_count in zip(bounds, window_counts):
+                stat_dict = {'count': window_count,
+                             'sum': prefix['sum'][end] - prefix['sum'][start],
+                             'sumsq': prefix['sumsq'][end] - prefix['sumsq'][start]}
+                result = _finalize_moments(stat_dict, self.aggregation_method)
+                if self.aggregation_method == 'mean':
+                    result = result + shift
+                elif self.aggregation_method == 'sum':
+                    result = result + window_count * shift
+                results.append(result)
+
+        for result, window_count, min_periods, position in zip(results, window_counts, minimum_periods, positions):
+            block[:, position] = np.where(window_count >= max(min_periods, 1), result, np.nan)
+
+        return pd.DataFrame(block, index=X.index, columns=names)
+
     def transform(self, X, y=None):
+        if check_dataframe(X) and time_index(X) and isinstance(self.window, list):
+            return self._multiple_windows(X)
+
         X = X.copy()
         if check_dataframe(X) and time_index(X):
-            rolling_x = X.rolling(window=self.window,
-                                  center=self.center,
-                                  axis=0,
-                                  closed=self.closed).agg(self.aggregation_method)
+            rolling_x = self._rolling(X, self.window)
             return rolling_x
 
         else:
             return X
+
+
+class StreamingResampler(BaseEstimator, TransformerMixin):
+    def __init__(self, rule, aggregation_method='mean', watermark=None):
+        """
+        StreamingResampler is a stateful version of Resampler for data that arrives in batches.
+        Only the partial aggregates (count, sum, sum of squared deviations, min, max) of the buckets that are
+        still open are kept, so memory grows with the number of open buckets and not with history.
+        Each call to transform ingests a batch and returns only the buckets that are final,
+        a bucket is final once the latest timestamp seen minus the watermark is past its end.
+        Rows which arrive after their bucket has been emitted are dropped and counted in late_rows_.
+        Buckets share the origin used by Resampler (midnight of the first day seen), so the
+        concatenated output matches Resampler on the concatenated input.
+
+        :param rule: str, fixed length date offset representing the target resolution eg 1T, 5T, 1H, 1D
+                    calendar offsets like 1M are not supported since bucket lengths vary.
+        :param aggregation_method:str, aggregation method, one of mean, std, max, min, sum
+        :param watermark: str, (default = None) how long to wait for late rows before a bucket is final,
+                eg '30S'. If None, a bucket is final as soon as a row from a later bucket is seen.
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import StreamingResampler
+        >>> df = pd.DataFrame({'price':[10, 11, 9, 13, 14, 18]},
+        ...                   index=pd.date_range('01/01/2018', periods=6, freq='20T'))
+        >>> resampler = StreamingResampler(rule='1H', aggregation_method='max')
+        >>> print(resampler.transform(X=df.iloc[:4]))
+                    price
+        2018-01-01   11.0
+        >>> print(resampler.transform(X=df.iloc[4:]))
+        Empty DataFrame
+        Columns: [price]
+        Index: []
+        >>> print(resampler.flush())
+                             price
+        2018-01-01 01:00:00   18.0
+
+        """
+        self.rule = rule
+        self.aggregation_method = aggregation_method
+        self.watermark = watermark
+        assert isinstance(rule, str), "rule must be a string"
+        assert _fixed_frequency(rule) is not None, "rule must be a fixed frequency eg 1T, 1H, 1D"
+        assert aggregation_method in ['mean','std','min','max','sum']
+        assert watermark is None or isinstance(watermark, str), "watermark must be a string or None"
+
+    def fit(self, X, y=None):
+        return self
+
+    def _reset(self, X):
+        self.step_ = _fixed_frequency(self.rule)
+        self.delay_ = 0 if self.watermark is None else pd.Timedelta(self.watermark).value
+        first = _epoch_nanos(X.index).min()
+        self.origin_ = first - first % NANOSECONDS_PER_DAY
+        self.columns_ = list(X.columns)
+        self.index_name_ = X.index.name
+        self.next_code_ = None
+        self.max_seen_ = None
+        self.late_rows_ = 0
+        self.open_codes_ = np.empty(0, dtype=np.int64)
+        self.open_stats_ = {stat: np.empty((0, len(self.columns_))) for stat in ['count','sum','m2','min','max']}
+
+    def partial_fit(self, X, y=None):
+        """
+        Adds a batch of rows to the partial aggregates of the open buckets without emitting anything
+        :param X: pandas dataframe with a timezone naive DatetimeIndex and numeric columns
+        :return: self
+        """
+        assert check_dataframe(X) and time_index(X), "X must be a dataframe with a DatetimeIndex"
+        assert X.index.tz is None, "X must have a timezone naive DatetimeIndex"
+
+        if len(X) == 0:
+            return self
+        if not hasattr(self, 'open_codes_'):
+            self._reset(X)
+
+        nanos = _epoch_nanos(X.index)
+        codes = (nanos - self.origin_) // self.step_
+        values = X.loc[:, self.columns_].to_numpy(dtype=np.float64)
+
+        batch_max = nanos.max()
+        self.max_seen_ = batch_max if self.max_seen_ is None else max(self.max_seen_, batch_max)
+        if self.next_code_ is None:
+            self.next_code_ = codes.min()
+
+        on_time = codes >= self.next_code_
+        self.late_rows_ += int((~on_time).sum())
+        batch_codes, batch_stats = _bucket_reduce(codes=codes[on_time],
+                                                  values=values[on_time],
+                                                  stats=['count','sum','m2','min','max'])
+
+        # merge the partial aggregates of the batch into the open buckets, the variances with Welford's
+        # parallel form so large values keep their precision
+        merged_codes = np.concatenate([self.open_codes_, batch_codes])
+        if merged_codes.size == 0:
+            return self
+        order = np.argsort(merged_codes, kind='mergesort')
+        stacked = {stat: np.concatenate([self.open_stats_[stat], batch_stats[stat]])[order]
+                   for stat in self.open_stats_}
+        self.open_codes_, self.open_stats_ = _merge_moments(codes=merged_codes[order], stat_dict=stacked, factor=1)
+
+        return self
+
+    def _emit(self, until_code):
+        """
+        Emits every bucket with a code lower than until_code, including empty buckets,
+        and removes them from the open buckets.
+        """
+        columns = getattr(self, 'columns_', [])
+        n_columns = len(columns)
+        if until_code is None or self.next_code_ is None or until_code <= self.next_code_:
+            index = pd.DatetimeIndex([], name=getattr(self, 'index_name_', None))
+            return pd.DataFrame(np.empty((0, n_columns)), index=index, columns=columns)
+
+        codes = np.arange(self.next_code_, until_code)
+        closed = self.open_codes_ < until_code
+        stat_dict = _densify(codes=self.open_codes_[closed],
+                             stat_dict={stat: array[closed] for stat, array in self.open_stats_.items()},
+                             first_code=self.next_code_,
+                             n_buckets=len(codes))
+
+        self.open_stats_ = {stat: array[~closed] for stat, array in self.open_stats_.items()}
+        self.open_codes_ = self.open_codes_[~closed]
+        self.next_code_ = until_code
+
+        index = pd.DatetimeIndex(self.origin_ + codes * self.step_, name=self.index_name_)
+        return pd.DataFrame(_finalize_moments(stat_dict, self.aggregation_method),
+                            index=index,
+                            columns=self.columns_)
+
+    def transform(self, X, y=None):
+        """
+        Ingests a batch and returns the buckets that became final
+        :param X: pandas dataframe with a timezone naive DatetimeIndex and numeric columns
+        :return: pandas dataframe of finalized buckets indexed by bucket start
+        """
+        self.partial_fit(X)
+        if getattr(self, 'max_seen_', None) is None:
+            return self._emit(until_code=None)
+        until_code = (self.max_seen_ - self.delay_ - self.origin_) // self.step_
+        return self._emit(until_code=until_code)
+
+    def flush(self):
+        """
+        Emits every open bucket, including the incomplete trailing bucket
+        :return: pandas dataframe of the remaining buckets indexed by bucket start
+        """
+        if not hasattr(self, 'open_codes_') or self.open_codes_.size == 0:
+            return self._emit(until_code=None)
+        return self._emit(until_code=self.open_codes_.max() + 1)
+
+
+class ResamplerPyramid(BaseEstimator, TransformerMixin):
+    mergeable = ['mean','std','var','min','max','sum','count']
+
+    def __init__(self, rules, aggregation_method='mean'):
+        """
+        ResamplerPyramid resamples the same data to several resolutions at once.
+        Only the finest level is computed from the raw rows, every coarser level is merged from the
+        count, sum, min, max and M2 (sum of squared deviations) of the level before it,
+        so the raw data is read once no matter how many levels are requested.
+
+        :param rules: list of fixed frequency rules from finest to coarsest eg ['1T', '1H', '1D', '7D'],
+                each rule must be a whole multiple of the rule before it.
+        :param aggregation_method:str or list, one or more of mean, std, var, max, min, sum, count
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import ResamplerPyramid
+        >>> df = pd.DataFrame({'price':range(48)}, index=pd.date_range('01/01/2018', periods=48, freq='1H'))
+        >>> pyramid = ResamplerPyramid(rules=['6H', '1D'], aggregation_method='max')
+        >>> levels = pyramid.transform(X=df)
+        >>> print(levels['1D'])
+                    price
+        2018-01-01     23
+        2018-01-02     47
+
+        """
+        self.rules = rules
+        self.aggregation_method = aggregation_method
+        assert isinstance(rules, list) and len(rules) > 0, "rules must be a non empty list"
+        assert isinstance(aggregation_method, (str, list)), "aggregation_method must be a string or list"
+        for rule in rules:
+            assert isinstance(rule, str), "every rule must be a string"
+            assert _fixed_frequency(rule) is not None, "every rule must be a fixed frequency eg 1T, 1H, 1D"
+        for finer, coarser in zip(rules[:-1], rules[1:]):
+            assert _fixed_frequency(coarser) % _fixed_frequency(finer) == 0, \
+                "{} is not a whole multiple of {}".format(coarser, finer)
+        for aggregation in (aggregation_method if isinstance(aggregation_method, list) else [aggregation_method]):
+            assert aggregation in self.mergeable, "aggregation_method must be among {}".format(self.mergeable)
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X, y=None):
+        """
+        :param X: pandas dataframe with a DatetimeIndex
+        :return: dictionary mapping each rule to its resampled dataframe
+        """
+        if not (check_dataframe(X) and time_index(X)):
+            return X
+
+        resamplers = [Resampler(rule=rule, aggregation_method=self.aggregation_method) for rule in self.rules]
+        pairs = resamplers[0]._aggregation_pairs(X)
+        used_columns = list(dict.fromkeys(col for col, name in pairs))
+        nanos = _epoch_nanos(X.index)
+        numeric = X.loc[:, used_columns].select_dtypes(include='number').shape[1] == len(used_columns)
+
+        if nanos is None or len(X) == 0 or not numeric:
+            return {rule: resampler.transform(X) for rule, resampler in zip(self.rules, resamplers)}
+
+        origin = nanos.min() - nanos.min() % NANOSECONDS_PER_DAY
+        step = _fixed_frequency(self.rules[0])
+        codes, stat_dict = _bucket_reduce(codes=(nanos - origin) // step,
+                                          values=X.loc[:, used_columns].to_numpy(dtype=np.float64),
+                                          stats=['count','sum','min','max','m2'])
+
+        levels = dict()
+        for level, (rule, resampler) in enumerate(zip(self.rules, resamplers)):
+            if level > 0:
+                factor = _fixed_frequency(rule) // step
+                codes, stat_dict = _merge_moments(codes=codes, stat_dict=stat_dict, factor=factor)
+                step = _fixed_frequency(rule)
+
+            first_code = codes[0]
+            n_buckets = codes[-1] - first_code + 1
+            index = pd.DatetimeIndex(origin + (first_code + np.arange(n_buckets)) * step,
+                                     name=X.index.name,
+                                     freq=rule)
+            levels[rule] = _bucket_frame(full=_densify(codes, stat_dict, first_code, n_buckets),
+                                         pairs=pairs,
+                                         used_columns=used_columns,
+                                         dtypes=dict(X.dtypes),
+                                         index=index,
+                                         columns=resampler._output_columns(pairs))
+        return levels
+
+
+class StreamingRollingWindow(BaseEstimator, TransformerMixin):
+    def __init__(self, window, aggregation_method='mean'):
+        """
+        StreamingRollingWindow is a stateful version of RollingWindow for data that arrives in batches.
+        Each call to transform returns the rolling aggregation of the rows in the batch, computed over
+        the window that ends at each row, including rows from earlier batches.
+        Only the rows inside the window are kept between calls, in a buffer of timestamps, values and running
+        prefix sums, so sum, mean, var and std of a row are a difference of two prefix sums, and
+        min and max are read off a monotonic deque per column. Each batch therefore costs O(batch).
+        Like RollingWindow, the prefix sums are of values shifted by a reference per column, the mean of
+        the first batch, which keeps the variance of large values precise.
+        Results match RollingWindow (closed on the right, at least one observation) on the concatenated data.
+
+        :param window: str, fixed length size of the moving window eg 30S, 5T, 1H, 1D
+        :param aggregation_method:str, aggregation method, one of mean, std, var, max, min, sum, count
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import StreamingRollingWindow
+        >>> df = pd.DataFrame({'price':[10, 11, 9, 13, 14, 18]},
+        ...                   index=pd.date_range('01/01/2018', periods=6, freq='1H'))
+        >>> roller = StreamingRollingWindow(window='3H', aggregation_method='sum')
+        >>> print(roller.transform(X=df.iloc[:4]))
+                             price
+        2018-01-01 00:00:00   10.0
+        2018-01-01 01:00:00   21.0
+        2018-01-01 02:00:00   30.0
+        2018-01-01 03:00:00   33.0
+        >>> print(roller.transform(X=df.iloc[4:]))
+                             price
+        2018-01-01 04:00:00   36.0
+        2018-01-01 05:00:00   45.0
+
+        """
+        self.window = window
+        self.aggregation_method = aggregation_method
+        assert isinstance(window, str), "window must be a string"
+        assert _fixed_frequency(window) is not None, "window must be a fixed frequency eg 1T, 1H, 1D"
+        assert aggregation_method in ['mean','std','var','min','max','sum','count']
+
+    def fit(self, X, y=None):
+        return self
+
+    def _reset(self, X):
+        self.window_nanos_ = _fixed_frequency(self.window)
+        self.columns_ = list(X.columns)
+        self.last_timestamp_ = None
+        n_columns = len(self.columns_)
+        values = X.loc[:, self.columns_].to_numpy(dtype=np.float64)
+        self.shift_ = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(n_columns)
+        capacity = 1024
+        self.head_ = 0
+        self.tail_ = 0
+        self.timestamps_ = np.empty(capacity, dtype=np.int64)
+        self.values_ = np.empty((capacity, n_columns))
+        # inclusive prefix sums of the shifted values, their squares and the number of values that are not missing
+        self.prefix_ = {stat: np.empty((capacity, n_columns)) for stat in ['sum','sumsq','count']}
+        self.deques_ = [deque() for _ in range(n_columns)]
+
+    def _reserve(self, n_rows):
+        """
+        Makes room for n_rows more rows at the end of the buffer,
+        live rows are moved to the front and prefix sums are rebased before the buffer is grown.
+        """
+        if self.tail_ + n_rows <= len(self.timestamps_):
+            return
+
+        live = slice(self.head_, self.tail_)
+        n_live = self.tail_ - self.head_
+        capacity = len(self.timestamps_)
+        if n_live + n_rows > capacity // 2:
+            capacity = max(2 * capacity, 2 * (n_live + n_rows))
+
+        timestamps = np.empty(capacity, dtype=np.int64)
+        timestamps[:n_live] = self.timestamps_[live]
+        values = np.empty((capacity, len(self.columns_)))
+        values[:n_live] = self.values_[live]
+
+        filled = np.where(np.isnan(values[:1]), 0.0, values[:1] - self.shift_)
+        base = {'sum': filled, 'sumsq': filled * filled, 'count': (~np.isnan(values[:1])).astype(np.float64)}
+        for stat, array in self.prefix_.items():
+            rebased = np.empty((capacity, len(self.columns_)))
+            if n_live > 0:
+                # subtract the prefix sum before the first live row to keep the numbers small
+                rebased[:n_live] = array[live] - (array[self.head_] - base[stat][0])
+            self.prefix_[stat] = rebased
+
+        self.timestamps_ = timestamps
+        self.values_ = values
+        self.head_ = 0
+        self.tail_ = n_live
+
+    def _extreme(self, nanos, values):
+        """
+        Rolling min or max of the batch from a monotonic deque per column
+        """
+        result = np.full(values.shape, np.nan)
+        compare = (lambda old, new: old >= new) if self.aggregation_method == 'min' else (lambda old, new: old <= new)
+        for j, window_deque in enumerate(self.deques_):
+            column = values[:, j]
+            for i in range(len(nanos)):
+                value = column[i]
+                if value == value:
+                    while window_deque and compare(window_deque[-1][1], value):
+                        window_deque.pop()
+                    window_deque.append((nanos[i], value))
+                while window_deque and window_deque[0][0] <= nanos[i] - self.window_nanos_:
+                    window_deque.popleft()
+                if window_deque:
+                    result[i, j] = window_deque[0][1]
+        return result
+
+    def transform(self, X, y=None):
+        """
+        :param X: pandas dataframe with a timezone naive, increasing DatetimeIndex, with timestamps
+                not earlier than the last timestamp of the previous batch
+        :return: pandas dataframe of the rolling aggregation for the rows of X
+        """
+        assert check_dataframe(X) and time_index(X), "X must be a dataframe with a DatetimeIndex"
+        assert X.index.tz is None, "X must have a timezone naive DatetimeIndex"
+        if not hasattr(self, 'timestamps_'):
+            self._reset(X)
+        if len(X) == 0:
+            return X.loc[:, self.columns_].astype(np.float64)
+
+        nanos = _epoch_nanos(X.index)
+        assert sorted_time_index(X), "the index of X must be increasing"
+        assert self.last_timestamp_ is None or nanos[0] >= self.last_timestamp_, \
+            "X must not start before the end of the previous batch"
+
+        values = X.loc[:, self.columns_].to_numpy(dtype=np.float64)
+        n_rows = len(nanos)
+
+        if self.aggregation_method in ['min', 'max']:
+            result = self._extreme(nanos, values)
+        else:
+            self._reserve(n_rows)
+            head, tail = self.head_, self.tail_
+            batch = slice(tail, tail + n_rows)
+            self.timestamps_[batch] = nanos
+            self.values_[batch] = values
+
+            valid = ~np.isnan(values)
+            filled = np.where(valid, values - self.shift_, 0.0)
+            increments = {'sum': filled, 'sumsq': filled * filled, 'count': valid.astype(np.float64)}
+            for stat, array in self.prefix_.items():
+                carry = array[tail - 1] if tail > head else 0.0
+                array[batch] = carry + np.cumsum(increments[stat], axis=0)
+            self.tail_ = tail + n_rows
+
+            # first row of the window (t - window, t] of each row in the batch
+            starts = head + np.searchsorted(self.timestamps_[head:self.tail_], nanos - self.window_nanos_, side='right')
+            start_values = self.values_[starts]
+            start_valid = ~np.isnan(start_values)
+            start_filled = np.where(start_valid, start_values - self.shift_, 0.0)
+            start_increments = {'sum': start_filled,
+                                'sumsq': start_filled * start_filled,
+                                'count': start_valid.astype(np.float64)}
+            window_stats = {stat: array[batch] - (array[starts] - start_increments[stat])
+                            for stat, array in self.prefix_.items()}
+            window_stats['count'] = np.rint(window_stats['count'])
+            result = _finalize_moments(window_stats, self.aggregation_method)
+            if self.aggregation_method == 'mean':
+                result = result + self.shift_
+            elif self.aggregation_method == 'sum':
+                result = result + window_stats['count'] * self.shift_
+            if self.aggregation_method != 'count':
+                result = np.where(window_stats['count'] > 0, result, np.nan)
+
+            # rows at or before the last timestamp minus the window can not be part of any later window
+            self.head_ = head + np.searchsorted(self.timestamps_[head:self.tail_],
+                                                nanos[-1] - self.window_nanos_,
+                                                side='right')
+
+        self.last_timestamp_ = nanos[-1]
+        return pd.DataFrame(result.astype(np.float64), index=X.index, columns=self.columns_)
+
+
+class RollingCorrelation(BaseEstimator, TransformerMixin):
+    def __init__(self, window, pairs=None, target=None, aggregation_method='corr', closed=None, dtype='float64'):
+        """
+        RollingCorrelation computes rolling correlation or covariance for selected pairs of columns only,
+        as a flat dataframe with one column per pair named <x>_<y>_<aggregation_method>,
+        instead of the k by k matrix per timestamp of RollingWindow(aggregation_method='corr').
+        Every pair is computed from rolling sums of x, y, x squared, y squared and x times y,
+        all read off prefix sums shared by every pair that uses the same column.
+
+        :param window: str or int, time window eg 4H, or number of rows
+        :param pairs: list of (x, y) tuples of column names, if None and target is None, every pair of
+                numeric columns is used.
+        :param target: str, name of a column to pair with every other numeric column, used when pairs is None
+        :param aggregation_method: str, one of corr or cov
+        :param closed: one of None, 'right','left','both','neither'
+        :param dtype: str, float64 or float32, dtype of the output, float32 halves its memory.
+                The rolling sums are computed in float64 either way.
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import RollingCorrelation
+        >>> df = pd.DataFrame({'A':[1, 2, 3, 4, 5], 'B':[2, 4, 7, 8, 10], 'C':[5, 3, 4, 1, 2]},
+        ...                   index=pd.date_range('01/01/2018', periods=5, freq='1H'))
+        >>> print(RollingCorrelation(window=3, target='A').transform(X=df))
+                             B_A_corr  C_A_corr
+        2018-01-01 00:00:00       NaN       NaN
+        2018-01-01 01:00:00       NaN       NaN
+        2018-01-01 02:00:00  0.993399 -0.500000
+        2018-01-01 03:00:00  0.960769 -0.654654
+        2018-01-01 04:00:00  0.981981 -0.654654
+
+        """
+        self.window = window
+        self.pairs = pairs
+        self.target = target
+        self.aggregation_method = aggregation_method
+        self.closed = closed
+        self.dtype = dtype
+        assert isinstance(window, (str, int)), "window must be a string or an integer"
+        assert pairs is None or isinstance(pairs, list), "pairs must be a list of tuples of column names"
+        assert target is None or isinstance(target, str), "target must be a string"
+        assert aggregation_method in ['corr', 'cov']
+        assert closed in [None,'right','left','both','neither']
+        assert dtype in ['float64', 'float32']
+
+    def fit(self, X, y=None):
+        return self
+
+    def _column_pairs(self, X):
+        if self.pairs is not None:
+            return [tuple(pair) for pair in self.pairs]
+        numeric_columns = list(X.select_dtypes(include='number').columns)
+        if self.target is not None:
+            return [(col, self.target) for col in numeric_columns if col != self.target]
+        return [(x, y) for i, x in enumerate(numeric_columns) for y in numeric_columns[i + 1:]]
+
+    def transform(self, X, y=None):
+        if not (check_dataframe(X) and time_index(X)):
+            return X
+
+        pairs = self._column_pairs(X)
+        names = ['{}_{}_{}'.format(x, y, self.aggregation_method) for x, y in pairs]
+        block = np.full((len(X), len(pairs)), np.nan, dtype=self.dtype)
+
+        fast = sorted_time_index(X) and \
+            (isinstance(self.window, int) and self.closed in [None, 'right'] or
+             isinstance(self.window, str) and _fixed_frequency(self.window) is not None)
+
+        if not fast:
+            for k, (x, y) in enumerate(pairs):
+                rolling = X[x].rolling(window=self.window, closed=self.closed)
+                block[:, k] = rolling.corr(X[y]) if self.aggregation_method == 'corr' else rolling.cov(X[y])
+            return pd.DataFrame(block, index=X.index, columns=names)
+
+        start, end, min_periods = _window_bounds(nanos=np.asarray(X.index.asi8), window=self.window, closed=self.closed)
+        columns = list(dict.fromkeys(col for pair in pairs for col in pair))
+        values = X.loc[:, columns].to_numpy(dtype=np.float64)
+        # shift every column by its mean so the prefix sums stay small
+        if len(values):
+            values = values - np.nan_to_num(np.nanmean(values, axis=0))
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0)
+        zero = np.zeros((1, len(columns)))
+
+        # prefix sums of each column, in float64 whatever the output dtype since float32 sums drift on long
+        # series, shared by all of its pairs when both columns have no missing values
+        single = {'count': np.vstack([zero, np.cumsum(valid, axis=0, dtype=np.float64)]),
+                  'sum': np.vstack([zero, np.cumsum(filled, axis=0, dtype=np.float64)]),
+                  'sumsq': np.vstack([zero, np.cumsum(filled * filled, axis=0, dtype=np.float64)])}
+        complete = valid.all(axis=0)
+        position = {col: j for j, col in enumerate(columns)}
+
+        def window_sum(prefix):
+            return prefix[end] - prefix[start]
+
+        for k, (x, y) in enumerate(pairs):
+            i, j = position[x], position[y]
+            if complete[i] and complete[j]:
+                count = window_sum(single['count'][:, i])
+                sum_x, sum_xx = window_sum(single['sum'][:, i]), window_sum(single['sumsq'][:, i])
+                sum_y, sum_yy = window_sum(single['sum'][:, j]), window_sum(single['sumsq'][:, j])
+                x_values, y_values = filled[:, i], filled[:, j]
+            else:
+                # only rows where both values are present count towards the pair
+                both = valid[:, i] & valid[:, j]
+                x_values = np.where(both, filled[:, i], 0)
+                y_values = np.where(both, filled[:, j], 0)
+                count = window_sum(np.r_[0, np.cumsum(both, dtype=np.float64)])
+                sum_x = window_sum(np.r_[0, np.cumsum(x_values, dtype=np.float64)])
+                sum_y = window_sum(np.r_[0, np.cumsum(y_values, dtype=np.float64)])
+                sum_xx = window_sum(np.r_[0, np.cumsum(x_values * x_values, dtype=np.float64)])
+                sum_yy = window_sum(np.r_[0, np.cumsum(y_values * y_values, dtype=np.float64)])
+            sum_xy = window_sum(np.r_[0, np.cumsum(x_values * y_values, dtype=np.float64)])
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                covariance = (sum_xy - sum_x * sum_y / count) / (count - 1)
+                if self.aggregation_method == 'corr':
+                    variance_x = np.maximum(sum_xx - sum_x * sum_x / count, 0)
+                    variance_y = np.maximum(sum_yy - sum_y * sum_y / count, 0)
+                    denominator = np.sqrt(variance_x * variance_y) / (count - 1)
+                    result = np.where(denominator > 0, covariance / denominator, np.nan)
+                else:
+                    result = covariance
+            block[:, k] = np.where((count >= max(min_periods, 1)) & (count > 1), result, np.nan)
+
+        return pd.DataFrame(block, index=X.index, columns=names)
+
+
+class LagFeatures(BaseEstimator, TransformerMixin):
+    def __init__(self, lags, column_list=None, group_by=None):
+        """
+        LagFeatures adds lagged (and lead) copies of columns as new columns.
+        The source row of every lag is found once as an integer position and all lags of all columns
+        are written into a single preallocated block, which is joined to X in one step.
+
+        :param lags: list of lags, an int k takes the value k rows earlier (a negative k is a lead,
+                k rows later), a string such as 1H or 1D takes the value of the last row at or before
+                the timestamp minus that offset, found with a binary search over the DatetimeIndex.
+                A negative string such as -1H is a lead and takes the value of the first row at or after
+                the timestamp plus the offset, so no row between the two is read.
+        :param column_list: list of column names to lag, if None all numeric columns are lagged
+        :param group_by: str, name of a column that identifies the entity for panel data, rows are only
+                lagged within their entity (row order is used for int lags, timestamps for offsets).
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import LagFeatures
+        >>> df = pd.DataFrame({'price':[10, 11, 9, 13], 'id':['a', 'b', 'a', 'b']},
+        ...                   index=pd.date_range('01/01/2018', periods=4, freq='1H'))
+        >>> print(LagFeatures(lags=[1, -1], group_by='id').transform(X=df))
+                             price id  price_lag_1  price_lead_1
+        2018-01-01 00:00:00     10  a          NaN           9.0
+        2018-01-01 01:00:00     11  b          NaN          13.0
+        2018-01-01 02:00:00      9  a         10.0           NaN
+        2018-01-01 03:00:00     13  b         11.0           NaN
+
+        """
+        self.lags = lags
+        self.column_list = column_list
+        self.group_by = group_by
+        assert isinstance(lags, list) and len(lags) > 0, "lags must be a non empty list"
+        assert all(isinstance(lag, (int, str)) for lag in lags), "every lag must be an integer or a string"
+        assert isinstance(column_list, list) or column_list is None, "column_list must be a list or None"
+        assert isinstance(group_by, str) or group_by is None, "group_by must be a string or None"
+
+    def fit(self, X, y=None):
+        return self
+
+    @staticmethod
+    def _name(col, lag):
+        if isinstance(lag, int) and lag < 0:
+            return '{}_lead_{}'.format(col, -lag)
+        if isinstance(lag, str) and lag.startswith('-'):
+            return '{}_lead_{}'.format(col, lag[1:])
+        return '{}_lag_{}'.format(col, lag)
+
+    def _sources(self, X):
+        """
+        Row position that every lag reads for every row of X, -1 where there is no such row
+        """
+        n_rows = len(X)
+        if self.group_by is None:
+            codes = np.zeros(n_rows, dtype=np.int64)
+        else:
+            codes = pd.factorize(X[self.group_by])[0].astype(np.int64)
+
+        time_lags = any(isinstance(lag, str) for lag in self.lags)
+        nanos = np.asarray(X.index.asi8) if time_lags else None
+        if time_lags:
+            order = np.lexsort((nanos, codes))
+        else:
+            order = np.argsort(codes, kind='mergesort')
+        sorted_codes = codes[order]
+        positions = np.arange(n_rows)
+
+        sources = list()
+        for lag in self.lags:
+            if isinstance(lag, int):
+                source = positions - lag
+                inside = (source >= 0) & (source < n_rows)
+                source = np.where(inside, source, 0)
+                same = inside & (sorted_codes[source] == sorted_codes)
+            else:
+                # rank timestamps and targets together so (entity, time) fits in one int64 key
+                offset = pd.Timedelta(lag).value
+                targets = nanos[order] - offset
+                ranks = np.unique(np.concatenate([nanos[order], targets]), return_inverse=True)[1]
+                n_ranks = ranks.max() + 1
+                row_keys = sorted_codes * n_ranks + ranks[:n_rows]
+                target_keys = sorted_codes * n_ranks + ranks[n_rows:]
+                if offset >= 0:
+                    # last row at or before the target
+                    source = np.searchsorted(row_keys, target_keys, side='right') - 1
+                else:
+                    # first row at or after the target
+                    source = np.searchsorted(row_keys, target_keys, side='left')
+                inside = (source >= 0) & (source < n_rows)
+                source = np.clip(source, 0, n_rows - 1)
+                same = inside & (sorted_codes[source] == sorted_codes)
+
+            # rows with a missing entity are not part of any entity, like in pandas groupby
+            same &= sorted_codes >= 0
+            row_source = np.full(n_rows, -1, dtype=np.int64)
+            row_source[order] = np.where(same, order[source], -1)
+            sources.append(row_source)
+        return sources
+
+    def transform(self, X, y=None):
+        if not check_dataframe(X):
+            return X
+        if any(isinstance(lag, str) for lag in self.lags) and not time_index(X):
+            return X
+
+        if self.column_list is None:
+            columns = [col for col in X.select_dtypes(include='number').columns if col != self.group_by]
+        else:
+            columns = self.column_list
+        values = X.loc[:, columns].to_numpy(dtype=np.float64)
+        n_columns = len(columns)
+
+        block = np.empty((len(X), n_columns * len(self.lags)))
+        names = list()
+        for k, (lag, source) in enumerate(zip(self.lags, self._sources(X))):
+            missing = source < 0
+            lagged = values[np.maximum(source, 0)]
+            lagged[missing] = np.nan
+            block[:, k * n_columns:(k + 1) * n_columns] = lagged
+            names.extend(self._name(col, lag) for col in columns)
+
+        return pd.concat([X, pd.DataFrame(block, index=X.index, columns=names)], axis=1)
+
+
+class EWMTransformer(BaseEstimator, TransformerMixin):
+    # largest decay exponent spanned by one block of the scan, exp(2 * 300) still fits in a float64
+    block_decay = 300.0
+
+    def __init__(self, column_list=None, aggregation_method='mean', halflife=None, span=None, alpha=None,
+                 stateful=False):
+        """
+        EWMTransformer replaces columns with their exponentially weighted moving mean, variance
+        or standard deviation, with the same weights as pandas ewm (adjust=True, ignore_na=False, bias=False).
+        The weighted sums are computed for all selected columns at once, as cumulative sums rescaled
+        within blocks of rows, and the decayed sums at the end of X are kept when stateful is True so that
+        the next call continues from them instead of recomputing history.
+
+        :param column_list: list of column names, if None all numeric columns are used
+        :param aggregation_method: str, one of mean, var, std
+        :param halflife: float, number of rows for a weight to halve, or str, eg 1H, for a time based halflife
+                computed from the DatetimeIndex, which may be irregular.
+        :param span: float, span of the decay, alpha = 2 / (span + 1)
+        :param alpha: float, smoothing factor between 0 and 1
+        :param stateful: bool, whether to resume from the state left by the previous call to transform
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import EWMTransformer
+        >>> df = pd.DataFrame({'price':[10, 11, 9, 13, 14, 18]},
+        ...                   index=pd.date_range('01/01/2018', periods=6, freq='1H'))
+        >>> ewm = EWMTransformer(halflife='2H', stateful=True)
+        >>> print(ewm.transform(X=df.iloc[:3]))
+                                 price
+        2018-01-01 00:00:00  10.000000
+        2018-01-01 01:00:00  10.585786
+        2018-01-01 02:00:00   9.867295
+        >>> print(ewm.transform(X=df.iloc[3:]))
+                                 price
+        2018-01-01 03:00:00  11.090693
+        2018-01-01 04:00:00  12.125790
+        2018-01-01 05:00:00  14.092094
+
+        """
+        self.column_list = column_list
+        self.aggregation_method = aggregation_method
+        self.halflife = halflife
+        self.span = span
+        self.alpha = alpha
+        self.stateful = stateful
+        assert isinstance(column_list, list) or column_list is None, "column_list must be a list or None"
+        assert aggregation_method in ['mean', 'var', 'std']
+        assert sum(parameter is not None for parameter in [halflife, span, alpha]) == 1, \
+            "exactly one of halflife, span or alpha must be provided"
+        assert alpha is None or 0 < alpha < 1, "alpha must be between 0 and 1"
+        assert span is None or span > 1, "span must be greater than 1"
+        assert halflife is None or isinstance(halflife, str) or halflife > 0, "halflife must be positive"
+        assert isinstance(stateful, bool), "stateful must be a boolean"
+
+    def fit(self, X, y=None):
+        return self
+
+    def _decay_positions(self, X):
+        """
+        Cumulative decay exponent of every row, relative to the last row of the previous call
+        """
+        n_rows = len(X)
+        first = 1 if self.stateful and getattr(self, 'state_', None) is not None else 0
+        if isinstance(self.halflife, str):
+            nanos = np.asarray(X.index.asi8)
+            reference = self.state_['timestamp'] if first else nanos[0]
+            return (nanos - reference) * (np.log(2) / pd.Timedelta(self.halflife).value)
+
+        if self.halflife is not None:
+            rate = np.log(2) / self.halflife
+        else:
+            alpha = self.alpha if self.alpha is not None else 2.0 / (self.span + 1)
+            rate = -np.log(1 - alpha)
+        return (np.arange(n_rows) + first) * rate
+
+    def transform(self, X, y=None):
+        if not check_dataframe(X) or (isinstance(self.halflife, str) and not time_index(X)):
+            return X
+
+        if self.column_list is None:
+            columns = list(X.select_dtypes(include='number').columns)
+        else:
+            columns = self.column_list
+        X = X.copy()
+        if len(X) == 0:
+            return X
+
+        values = X.loc[:, columns].to_numpy(dtype=np.float64)
+        positions = self._decay_positions(X)
+
+        state = getattr(self, 'state_', None) if self.stateful else None
+        if state is None or state['columns'] != columns:
+            first_valid = np.where(np.isnan(values), np.nan, values)
+            # shift every column by a value near its level so the weighted squares stay small
+            shift = np.nan_to_num(first_valid[np.argmax(~np.isnan(values), axis=0), np.arange(len(columns))])
+            zero = np.zeros(len(columns))
+            state = {'columns': columns, 'shift': shift, 'position': positions[0],
+                     'sum': zero, 'weight': zero, 'weight_squared': zero, 'sum_squared': zero}
+
+        valid = ~np.isnan(values)
+        shifted = np.where(valid, values - state['shift'], 0.0)
+        weights = valid.astype(np.float64)
+
+        sums = {stat: np.empty(values.shape) for stat in ['sum', 'weight', 'weight_squared', 'sum_squared']}
+        increments = {'sum': shifted, 'weight': weights, 'weight_squared': weights, 'sum_squared': shifted * shifted}
+        carry = {stat: state[stat] for stat in sums}
+        previous = state['position']
+
+        blocks = np.floor((positions - positions[0]) / self.block_decay).astype(np.int64)
+        boundaries = np.flatnonzero(np.r_[True, blocks[1:] != blocks[:-1], True])
+
+        for block_start, block_end in zip(boundaries[:-1], boundaries[1:]):
+            block = slice(block_start, block_end)
+            local = positions[block] - positions[block_start]
+            gap = positions[block_start] - previous
+            for stat in sums:
+                power = 2.0 if stat == 'weight_squared' else 1.0
+                growth = np.exp(power * local)[:, None]
+                start_carry = np.exp(-power * gap) * carry[stat]
+                sums[stat][block] = (start_carry + np.cumsum(growth * increments[stat][block], axis=0)) / growth
+                carry[stat] = sums[stat][block_end - 1]
+            previous = positions[block_end - 1]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = sums['sum'] / sums['weight']
+            if self.aggregation_method == 'mean':
+                result = mean + state['shift']
+            else:
+                weight = sums['weight']
+                biased = np.maximum(sums['sum_squared'] / weight - mean * mean, 0.0)
+                correction = weight * weight / (weight * weight - sums['weight_squared'])
+                result = np.where(weight * weight > sums['weight_squared'] * (1 + 1e-12), biased * correction, np.nan)
+                if self.aggregation_method == 'std':
+                    result = np.sqrt(result)
+
+        if self.stateful:
+            state = dict(state)
+            state.update({stat: carry[stat] for stat in sums})
+            state['position'] = 0.0
+            if isinstance(self.halflife, str):
+                state['timestamp'] = X.index.asi8[-1]
+            self.state_ = state
+
+        X[columns] = result
+        return X
+
+
+def _civil_from_days(days):
+    """
+    Year, month and day of days since 1970-01-01, vectorized form of the civil_from_days algorithm
+    by Howard Hinnant (http://howardhinnant.github.io/date_algorithms.html)
+    :param days: numpy int64 array of days since the epoch
+    :return: tuple of numpy int64 arrays (year, month, day)
+    """
+    z = days + 719468
+    era = z // 146097
+    day_of_era = z - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    shifted_month = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = np.where(shifted_month < 10, shifted_month + 3, shifted_month - 9)
+    year = year_of_era + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def _days_from_civil(year, month, day):
+    """
+    Days since 1970-01-01 of a date, the inverse of _civil_from_days
+    """
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+class CalendarFeatures(BaseEstimator, TransformerMixin):
+    features_available = ['minute', 'hour', 'dayofweek', 'day', 'dayofyear', 'weekofyear', 'month',
+                          'quarter', 'year', 'weekend', 'holiday']
+
+    # number of values in the cycle of each feature that can be encoded with sine and cosine
+    periods = {'minute': 60, 'hour': 24, 'dayofweek': 7, 'day': 31, 'dayofyear': 366, 'weekofyear': 53, 'month': 12}
+
+    dtypes = {'minute': np.int8, 'hour': np.int8, 'dayofweek': np.int8, 'day': np.int8, 'dayofyear': np.int16,
+              'weekofyear': np.int8, 'month': np.int8, 'quarter': np.int8, 'year': np.int16,
+              'weekend': np.bool_, 'holiday': np.bool_}
+
+    def __init__(self, features=None, cyclical=None, holidays=None):
+        """
+        CalendarFeatures adds calendar columns derived from the DatetimeIndex.
+        Every feature is computed with integer arithmetic on the int64 nanoseconds of the index,
+        and stored in the smallest integer dtype that holds it (int8, int16 or bool).
+        A timezone aware index is converted to its local time first.
+
+        :param features: list of features, from minute, hour, dayofweek (Monday is 0), day, dayofyear,
+                weekofyear (ISO week), month, quarter, year, weekend and holiday.
+                If None, hour, dayofweek, month and year are added.
+        :param cyclical: list of features to also encode as <feature>_sin and <feature>_cos (float32) columns,
+                from minute, hour, dayofweek, day, dayofyear, weekofyear, month.
+        :param holidays: list of dates, required for the holiday feature. They are kept as a sorted array of
+                day numbers and every row is looked up with a binary search.
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import CalendarFeatures
+        >>> df = pd.DataFrame({'price':[10, 11, 9]}, index=pd.date_range('12/31/2017 22:00', periods=3, freq='1H'))
+        >>> calendar = CalendarFeatures(features=['hour', 'dayofweek', 'holiday'], holidays=['2018-01-01'])
+        >>> print(calendar.transform(X=df))
+                             price  hour  dayofweek  holiday
+        2017-12-31 22:00:00     10    22          6    False
+        2017-12-31 23:00:00     11    23          6    False
+        2018-01-01 00:00:00      9     0          0     True
+
+        """
+        self.features = features
+        self.cyclical = cyclical
+        self.holidays = holidays
+        assert isinstance(features, list) or features is None, "features must be a list or None"
+        assert isinstance(cyclical, list) or cyclical is None, "cyclical must be a list or None"
+        for feature in (features or []):
+            assert feature in self.features_available, "features must be among {}".format(self.features_available)
+        for feature in (cyclical or []):
+            assert feature in self.periods, "cyclical features must be among {}".format(list(self.periods))
+        assert holidays is not None or 'holiday' not in (features or []), "holidays are required for holiday"
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X, y=None):
+        if not (check_dataframe(X) and time_index(X)):
+            return X
+
+        index = X.index.tz_localize(None) if X.index.tz is not None else X.index
+        nanos = np.asarray(index.asi8)
+        days = nanos // NANOSECONDS_PER_DAY
+        nanos_of_day = nanos - days * NANOSECONDS_PER_DAY
+        features = self.features if self.features is not None else ['hour', 'dayofweek', 'month', 'year']
+        cyclical = self.cyclical or []
+        needed = set(features) | set(cyclical)
+
+        computed = dict()
+        computed['minute'] = nanos_of_day // (60 * 10 ** 9) % 60
+        computed['hour'] = nanos_of_day // (3600 * 10 ** 9)
+        # 1970-01-01 was a Thursday
+        computed['dayofweek'] = (days + 3) % 7
+        computed['weekend'] = computed['dayofweek'] >= 5
+        if needed & {'day', 'dayofyear', 'weekofyear', 'month', 'quarter', 'year'}:
+            year, month, day = _civil_from_days(days)
+            computed['year'], computed['month'], computed['day'] = year, month, day
+            computed['quarter'] = (month - 1) // 3 + 1
+            computed['dayofyear'] = days - _days_from_civil(year, 1, 1) + 1
+            if 'weekofyear' in needed:
+                # the ISO week is the week of the Thursday of the same week
+                thursday = days - computed['dayofweek'] + 3
+                thursday_year = _civil_from_days(thursday)[0]
+                computed['weekofyear'] = (thursday - _days_from_civil(thursday_year, 1, 1)) // 7 + 1
+        if 'holiday' in needed:
+            holiday_days = np.unique(pd.to_datetime(self.holidays).normalize().asi8 // NANOSECONDS_PER_DAY)
+            position = np.minimum(np.searchsorted(holiday_days, days), max(len(holiday_days) - 1, 0))
+            computed['holiday'] = (holiday_days[position] == days) if len(holiday_days) \
+                else np.zeros(len(days), dtype=bool)
+
+        new_columns = dict()
+        for feature in features:
+            new_columns[feature] = computed[feature].astype(self.dtypes[feature])
+        for feature in cyclical:
+            offset = 1 if feature in ['day', 'dayofyear', 'weekofyear', 'month'] else 0
+            angle = 2 * np.pi * (computed[feature] - offset) / self.periods[feature]
+            new_columns[feature + '_sin'] = np.sin(angle).astype(np.float32)
+            new_columns[feature + '_cos'] = np.cos(angle).astype(np.float32)
+
+        return pd.concat([X, pd.DataFrame(new_columns, index=X.index)], axis=1)
+
+
+class TimeIndexer(BaseEstimator, TransformerMixin):
+    def __init__(self, column, format=None, sample_size=100, sort=False, allow_duplicates=True, drop=True):
+        """
+        TimeIndexer parses a column of timestamps and makes it the DatetimeIndex of the dataframe.
+        The format of string timestamps is inferred once from a sample of the column and cached,
+        so the whole column is parsed with an explicit format instead of per value inference.
+        Order and duplicates are checked together from the differences of the int64 timestamps, the result
+        is kept in is_monotonic_ and has_duplicates_. Resampler, RollingWindow and the other time transformers
+        check the order of the output index with sorted_time_index, pandas caches the answer on the index so
+        it is computed once and the index is not sorted again.
+
+        :param column: str, name of the column with the timestamps
+        :param format: str, strftime format of the timestamps eg %Y-%m-%d %H:%M:%S, inferred if None
+        :param sample_size: int, number of values sampled to infer the format
+        :param sort: bool, whether to sort the rows by time when the timestamps are not in order
+        :param allow_duplicates: bool, if False repeated timestamps raise an error
+        :param drop: bool, whether to drop the column once it is the index
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import TimeIndexer
+        >>> df = pd.DataFrame({'price':[10, 11, 9], 'time':['1/3/2019 10:00', '1/2/2019 10:00', '1/4/2019 10:00']})
+        >>> indexer = TimeIndexer(column='time', sort=True)
+        >>> print(indexer.transform(X=df))
+                             price
+        time
+        2019-01-02 10:00:00     11
+        2019-01-03 10:00:00     10
+        2019-01-04 10:00:00      9
+        >>> print(indexer.format_, indexer.is_monotonic_)
+        %m/%d/%Y %H:%M False
+
+        """
+        self.column = column
+        self.format = format
+        self.sample_size = sample_size
+        self.sort = sort
+        self.allow_duplicates = allow_duplicates
+        self.drop = drop
+        assert isinstance(column, str), "column must be a string"
+        assert isinstance(format, str) or format is None, "format must be a string or None"
+        assert isinstance(sample_size, int) and sample_size > 0, "sample_size must be a positive integer"
+        assert isinstance(sort, bool), "sort must be a boolean"
+        assert isinstance(allow_duplicates, bool), "allow_duplicates must be a boolean"
+        assert isinstance(drop, bool), "drop must be a boolean"
+
+    def fit(self, X, y=None):
+        assert check_dataframe(X) and check_columns(df=X, column_list=[self.column]), \
+            "X must be a dataframe with column {}".format(self.column)
+        self.format_ = self.format
+        if self.format_ is None and X[self.column].dtype == object:
+            self.format_ = infer_datetime_format(X[self.column], sample_size=self.sample_size)
+        return self
+
+    def transform(self, X, y=None):
+        if not hasattr(self, 'format_'):
+            self.fit(X)
+
+        column = X[self.column]
+        if pd.api.types.is_datetime64_any_dtype(column.dtype):
+            timestamps = pd.DatetimeIndex(column)
+        else:
+            timestamps = pd.DatetimeIndex(pd.to_datetime(column, format=self.format_, cache=True))
+        timestamps.name = self.column
+
+        X = X.drop(columns=[self.column]) if self.drop else X.copy()
+        X.index = timestamps
+
+        # one pass over the differences tells both order and duplicates
+        nanos = np.asarray(timestamps.asi8)
+        differences = np.diff(nanos)
+        self.is_monotonic_ = bool((differences >= 0).all())
+        if self.is_monotonic_:
+            self.has_duplicates_ = bool((differences == 0).any())
+        else:
+            self.has_duplicates_ = bool(timestamps.has_duplicates)
+        assert self.allow_duplicates or not self.has_duplicates_, "the timestamps in {} repeat".format(self.column)
+
+        if self.sort and not self.is_monotonic_:
+            X = X.iloc[np.argsort(nanos, kind='mergesort')]
+
+        return X
+
+
+def _fill_positions(valid, limit=None, backward=False):
+    """
+    Row each value is filled from when filling forward (or backward), -1 where there is none
+    :param valid: 2-D boolean numpy array, True where a value is present
+    :param limit: int, maximum number of consecutive missing values filled, None for no limit
+    :param backward: bool, fill from the next value instead of the previous one
+    :return: 2-D numpy int64 array of row positions
+    """
+    n_rows = valid.shape[0]
+    rows = np.arange(n_rows)[:, None]
+    if backward:
+        source = np.where(valid, rows, n_rows)
+        source = np.minimum.accumulate(source[::-1], axis=0)[::-1]
+        distance = source - rows
+        source = np.where(source < n_rows, source, -1)
+    else:
+        source = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+        distance = rows - source
+    if limit is not None:
+        source = np.where(distance <= limit, source, -1)
+    return source
+
+
+class TimeRegularizer(BaseEstimator, TransformerMixin):
+    def __init__(self, freq, reducer='mean', fill_method=None, limit=None):
+        """
+        TimeRegularizer turns an irregular series with gaps and repeated timestamps into a regular one.
+        Rows are assigned to slots of a regular grid (with the origin used by Resampler), rows sharing a
+        slot are combined with the reducer, the grid is filled in one vectorized pass and the gaps found
+        are reported in gap_stats_ for monitoring. Empty slots are missing until they are filled.
+        Numeric columns are combined with the reducer, other columns keep the last row of the slot.
+
+        :param freq: str, fixed length target frequency eg 1S, 1T, 1H
+        :param reducer: str, how rows sharing a slot are combined, one of mean, median, sum, min, max, first, last
+        :param fill_method: str, how empty slots and missing values are filled, one of None, ffill, bfill,
+                interpolate (linear in time, only between two values) or zero.
+        :param limit: int, (default = None) the maximum number of consecutive missing values to fill
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import TimeRegularizer
+        >>> df = pd.DataFrame({'price':[10, 12, 11, 15]},
+        ...                   index=pd.to_datetime(['2018-01-01 00:00', '2018-01-01 00:00', '2018-01-01 01:00',
+        ...                                         '2018-01-01 04:00']))
+        >>> regularizer = TimeRegularizer(freq='1H', reducer='mean', fill_method='interpolate')
+        >>> print(regularizer.transform(X=df))
+                             price
+        2018-01-01 00:00:00  11.000000
+        2018-01-01 01:00:00  11.000000
+        2018-01-01 02:00:00  12.333333
+        2018-01-01 03:00:00  13.666667
+        2018-01-01 04:00:00  15.000000
+        >>> regularizer.gap_stats_['missing_slots']
+        2
+
+        """
+        self.freq = freq
+        self.reducer = reducer
+        self.fill_method = fill_method
+        self.limit = limit
+        assert isinstance(freq, str) and _fixed_frequency(freq) is not None, "freq must be a fixed frequency eg 1T, 1H"
+        assert reducer in ['mean', 'median', 'sum', 'min', 'max', 'first', 'last']
+        assert fill_method in [None, 'ffill', 'bfill', 'interpolate', 'zero']
+        assert isinstance(limit, int) or limit is None
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X, y=None):
+        if not (check_dataframe(X) and time_index(X)) or len(X) == 0:
+            return X
+
+        step = _fixed_frequency(self.freq)
+        nanos = np.asarray(X.index.asi8)
+        ordered = sorted_time_index(X)
+        order = np.arange(len(X)) if ordered else np.argsort(nanos, kind='mergesort')
+        nanos = nanos[order]
+
+        # gaps and duplicates from one pass over the differences
+        differences = np.diff(nanos)
+        origin = nanos[0] - nanos[0] % NANOSECONDS_PER_DAY
+        codes = (nanos - origin) // step
+        first_code = codes[0]
+        n_slots = codes[-1] - first_code + 1
+        occupied = np.r_[True, codes[1:] != codes[:-1]]
+        self.gap_stats_ = {'rows': len(X),
+                           'out_of_order': not ordered,
+                           'duplicate_timestamps': int((differences == 0).sum()),
+                           'rows_sharing_a_slot': int(len(X) - occupied.sum()),
+                           'gaps': int((np.diff(codes) > 1).sum()),
+                           'missing_slots': int(n_slots - occupied.sum()),
+                           'largest_gap': pd.Timedelta(int(differences.max()) if len(differences) else 0)}
+
+        numeric_columns = list(X.select_dtypes(include='number').columns)
+        other_columns = [col for col in X.columns if col not in numeric_columns]
+        slot_positions = codes[occupied] - first_code
+        block = np.full((n_slots, len(numeric_columns)), np.nan)
+
+        if numeric_columns:
+            values = X.loc[:, numeric_columns].to_numpy(dtype=np.float64)[order]
+            statistic = 'median' if self.reducer == 'median' else self.reducer
+            stats = ['sum', 'count'] if self.reducer == 'mean' else [statistic]
+            slot_codes, reduced = _bucket_reduce(codes=codes, values=values, stats=stats)
+            block[slot_positions] = _finalize_moments(reduced, 'mean') if self.reducer == 'mean' \
+                else reduced[statistic]
+
+        valid = ~np.isnan(block)
+        if self.fill_method in ['ffill', 'bfill']:
+            source = _fill_positions(valid, limit=self.limit, backward=self.fill_method == 'bfill')
+            block = np.where(source >= 0, np.take_along_axis(block, np.maximum(source, 0), axis=0), np.nan)
+        elif self.fill_method == 'interpolate':
+            previous = _fill_positions(valid, limit=None)
+            following = _fill_positions(valid, limit=None, backward=True)
+            inside = (previous >= 0) & (following >= 0)
+            low = np.take_along_axis(block, np.maximum(previous, 0), axis=0)
+            high = np.take_along_axis(block, np.maximum(following, 0), axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                weight = np.where(following > previous,
+                                  (np.arange(n_slots)[:, None] - previous) / (following - previous), 0.0)
+            interpolated = low + (high - low) * weight
+            if self.limit is not None:
+                inside &= (np.arange(n_slots)[:, None] - previous) <= self.limit
+            block = np.where(valid, block, np.where(inside, interpolated, np.nan))
+        elif self.fill_method == 'zero':
+            fill = valid == valid
+            if self.limit is not None:
+                fill = np.arange(n_slots)[:, None] - _fill_positions(valid, limit=None) <= self.limit
+            block = np.where(valid, block, np.where(fill, 0.0, np.nan))
+
+        index = pd.DatetimeIndex(origin + (first_code + np.arange(n_slots)) * step, name=X.index.name, freq=self.freq)
+        regular = pd.DataFrame(block, index=index, columns=numeric_columns)
+
+        if other_columns:
+            # last row of each slot for the columns that can not be reduced
+            last_rows = order[np.r_[np.flatnonzero(occupied)[1:] - 1, len(X) - 1]]
+            others = X[other_columns].iloc[last_rows]
+            others.index = index[slot_positions]
+            others = others.reindex(index)
+            if self.fill_method in ['ffill', 'bfill']:
+                others = getattr(others, self.fill_method)(limit=self.limit)
+            regular = pd.concat([regular, others], axis=1)
+
+        return regular.loc[:, list(X.columns)]
+
+
+class TimeSlicer(BaseEstimator, TransformerMixin):
+    def __init__(self, windows, inclusive='both'):
+        """
+        TimeSlicer cuts time windows out of a dataframe with a DatetimeIndex.
+        The order of the index is checked once, the boundaries of every window are found together with a
+        binary search over the int64 timestamps, and each window is returned as a positional slice (iloc),
+        which shares memory with X instead of building a boolean mask over every row.
+        An index that is not in order is sorted once first.
+
+        :param windows: tuple (start, end) for a single window, or a list of such tuples for many windows
+                eg train, validation and backtest periods. start or end may be None for an open ended window.
+                A string names the whole period at its resolution like pandas partial string indexing,
+                eg an end of '2018-01-03' includes every row of that day, as .loc[:'2018-01-03'] does.
+        :param inclusive: str, which ends of a window are included, one of both, left, right, neither
+
+        Usage
+        >>> import pandas as pd
+        >>> from datamallet.tabular.timeseries import TimeSlicer
+        >>> df = pd.DataFrame({'price':[10, 11, 9, 13, 14]}, index=pd.date_range('01/01/2018', periods=5, freq='1D'))
+        >>> train, test = TimeSlicer(windows=[(None, '2018-01-03'), ('2018-01-04', None)]).transform(X=df)
+        >>> print(test)
+                    price
+        2018-01-04     13
+        2018-01-05     14
+
+        """
+        self.windows = windows
+        self.inclusive = inclusive
+        assert isinstance(windows, (tuple, list)), "windows must be a tuple or a list of tuples"
+        for window in (windows if isinstance(windows, list) else [windows]):
+            assert isinstance(window, tuple) and len(window) == 2, "every window must be a (start, end) tuple"
+        assert inclusive in ['both', 'left', 'right', 'neither']
+
+    def fit(self, X, y=None):
+        return self
+
+    def positions(self, X):
+        """
+        Row positions of the windows in X, X must have an index in order
+        :param X: pandas dataframe with a DatetimeIndex
+        :return: 2-D numpy int64 array with a (first row, one past the last row) pair per window
+        """
+        windows = self.windows if isinstance(self.windows, list) else [self.windows]
+        nanos = np.asarray(X.index.asi8)
+        tz = X.index.tz
+
+        def boundary(timestamp, default, period_start):
+            if timestamp is None:
+                return default
+            if isinstance(timestamp, str) and pd.Timestamp(timestamp).tzinfo is None:
+                # a string such as 2018-01-03 stands for its whole period, from its first to its last nanosecond
+                period = pd.Period(timestamp)
+                timestamp = period.start_time if period_start else period.end_time
+            timestamp = pd.Timestamp(timestamp)
+            if tz is not None and timestamp.tzinfo is None:
+                timestamp = timestamp.tz_localize(tz)
+            return timestamp.value
+
+        # an included start (end) is the first (last) instant of its period, an excluded one the last (first)
+        start_included = self.inclusive in ['both', 'left']
+        end_included = self.inclusive in ['both', 'right']
+        starts = np.array([boundary(start, np.iinfo(np.int64).min, start_included) for start, end in windows],
+                          dtype=np.int64)
+        ends = np.array([boundary(end, np.iinfo(np.int64).max, not end_included) for start, end in windows],
+                        dtype=np.int64)
+        first = np.searchsorted(nanos, starts, side='left' if start_included else 'right')
+        last = np.searchsorted(nanos, ends, side='right' if end_included else 'left')
+        first[[start is None for start, end in windows]] = 0
+        last[[end is None for start, end in windows]] = len(nanos)
+        return np.column_stack([first, np.maximum(first, last)])
+
+    def transform(self, X, y=None):
+        """
+        :param X: pandas dataframe with a DatetimeIndex
+        :return: pandas dataframe for a single window, list of pandas dataframes for a list of windows
+        """
+        if not (check_dataframe(X) and time_index(X)):
+            return X
+
+        if not sorted_time_index(X):
+            X = X.iloc[np.argsort(np.asarray(X.index.asi8), kind='mergesort')]
+
+        slices = [X.iloc[first:last] for first, last in self.positions(X)]
+        return slices if isinstance(self.windows, list) else slices[0]
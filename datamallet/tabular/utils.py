@@ -1,4 +1,13 @@
+import hashlib
+import zlib
+import numpy as np
 import pandas as pd
+from sklearn.base import clone
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    from pandas._libs.tslibs.parsing import guess_datetime_format
 
 
 def time_index(df):
@@ -24,6 +33,71 @@ def time_index(df):
     return isinstance(df.index, pd.core.indexes.datetimes.DatetimeIndex)
 
 
+def sorted_time_index(df):
+    """
+    Checks whether the index of the dataframe is a DatetimeIndex in increasing order.
+    pandas caches the answer on the index, so checking the same index again is free
+    and a reordered frame, which gets a new index, is always checked.
+    :param df: pandas dataframe
+    :return: True or False
+
+    Usage
+    >>> import pandas as pd
+    >>> from datamallet.tabular.utils import sorted_time_index
+    >>> df = pd.DataFrame({'A':[1,2,3]}, index=pd.to_datetime(['1/2/2019','1/3/2019','1/1/2019']))
+    >>> sorted_time_index(df=df)
+    False
+    >>> sorted_time_index(df=df.sort_index())
+    True
+
+    """
+    if not time_index(df=df):
+        return False
+
+    return df.index.is_monotonic_increasing
+
+
+def infer_datetime_format(values, sample_size=100, max_failure_rate=0.0):
+    """
+    Infers the strftime format of date strings from a strided sample of the values.
+    Formats guessed from a few sample values are tried on the whole sample, the first
+    one that parses all but max_failure_rate of the sampled values is returned.
+    :param values: pandas series, list or numpy array of strings
+    :param sample_size: int, number of values to sample
+    :param max_failure_rate: float, largest share of sampled strings that may fail to parse
+    :return: str, format such as %Y-%m-%d %H:%M:%S, or None if no format parses the sample
+
+    Usage
+    >>> from datamallet.tabular.utils import infer_datetime_format
+    >>> infer_datetime_format(['1/2/2019','1/3/2019','1/24/2019'])
+    '%m/%d/%Y'
+
+    """
+    assert isinstance(sample_size, int) and sample_size > 0, "sample_size must be a positive integer"
+    assert 0 <= max_failure_rate < 1, "max_failure_rate must be between 0 and 1"
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    step = max(len(values) // sample_size, 1)
+    sample = values.iloc[::step].dropna()
+    sample = sample[sample.map(lambda value: isinstance(value, str))]
+    if len(sample) == 0:
+        return None
+
+    # with failures allowed a bad value among the first ones does not stop the others from guessing
+    candidates = list()
+    for value in sample.iloc[:5 + int(np.ceil(max_failure_rate * len(sample)))]:
+        for dayfirst in [False, True]:
+            guess = guess_datetime_format(value, dayfirst=dayfirst)
+            if guess is not None and guess not in candidates:
+                candidates.append(guess)
+
+    for candidate in candidates:
+        parsed = pd.to_datetime(sample, format=candidate, errors='coerce')
+        if parsed.isna().mean() <= max_failure_rate:
+            return candidate
+
+    return None
+
+
 def check_dataframe(df):
     """
     Checks to see that the provided object is a pandas dataframe
@@ -283,6 +357,65 @@ def unique_count(df):
     return unique_count_dict
 
 
+def downcast_dtype(series, category_ratio=0.5, lossless_float=True):
+    """
+    Smallest dtype that holds every value of a column. Integer columns get the smallest integer dtype of the
+    same signedness that holds their min and max, float64 columns get float32 when every value fits, object
+    columns with few distinct values get category.
+    :param series: pandas series
+    :param category_ratio: float, object columns with at most category_ratio * len(series) distinct values
+            become category
+    :param lossless_float: bool, when True float32 is chosen only if converting back gives the same values,
+            when False whenever the values are within the range of float32
+    :return: numpy dtype or 'category', None when the column is already in its smallest dtype
+
+    Usage
+    >>> import pandas as pd
+    >>> from datamallet.tabular.utils import downcast_dtype
+    >>> downcast_dtype(pd.Series([1, 2, 300]))
+    dtype('int16')
+    >>> downcast_dtype(pd.Series(['dog', 'cat', 'dog', 'dog']))
+    'category'
+
+    """
+    assert isinstance(series, pd.Series), "series must be a pandas series"
+    assert 0 <= category_ratio <= 1, "category_ratio must be between 0 and 1"
+    dtype = series.dtype
+    if not isinstance(dtype, np.dtype) or len(series) == 0:
+        return None
+
+    if dtype.kind in 'iu':
+        minimum, maximum = series.min(), series.max()
+        candidates = ['int8', 'int16', 'int32'] if dtype.kind == 'i' else ['uint8', 'uint16', 'uint32']
+        for candidate in map(np.dtype, candidates):
+            if candidate.itemsize >= dtype.itemsize:
+                break
+            if np.iinfo(candidate).min <= minimum and maximum <= np.iinfo(candidate).max:
+                return candidate
+        return None
+
+    if dtype == np.float64:
+        values = series.to_numpy()
+        finite = values[np.isfinite(values)]
+        if len(finite) > 0 and np.abs(finite).max() > np.finfo(np.float32).max:
+            return None
+        if lossless_float:
+            converted = values.astype(np.float32).astype(np.float64)
+            if not ((converted == values) | np.isnan(values)).all():
+                return None
+        return np.dtype(np.float32)
+
+    if dtype == object:
+        try:
+            n_unique = series.nunique(dropna=False)
+        except TypeError:  # unhashable values such as lists
+            return None
+        if n_unique <= category_ratio * len(series):
+            return 'category'
+
+    return None
+
+
 def extract_numeric_cols(df):
     """
     Utility function for obtaining all numeric columns in a dataframe
@@ -636,3 +769,207 @@ def percentage_missing(df):
     return percentage_missing_dict
 
 
+def _buffer_hash(values):
+    """
+    crc32 and adler32 of the raw bytes of a numpy array, 8 bytes together
+    """
+    data = np.ascontiguousarray(values).view(np.uint8)
+    return zlib.crc32(data).to_bytes(4, 'little') + zlib.adler32(data).to_bytes(4, 'little')
+
+
+def _values_hash(values, step=1):
+    """
+    Hash of every step-th value of a column or an index, over the raw buffer when the values have a fixed width
+    """
+    if isinstance(values, pd.RangeIndex):
+        return repr((values.start, values.stop, values.step)).encode()
+    if isinstance(values, pd.MultiIndex):
+        return b''.join(_values_hash(values.get_level_values(level), step) for level in range(values.nlevels))
+    if isinstance(values.dtype, np.dtype):
+        values = np.asarray(values)[::step]
+        if values.dtype.kind in 'biufcmM':
+            return _buffer_hash(values)
+    elif isinstance(values.dtype, pd.CategoricalDtype):
+        values = pd.Categorical(values)
+        return _buffer_hash(values.codes[::step]) + _values_hash(values.categories)
+    elif isinstance(values.dtype, pd.DatetimeTZDtype):
+        return _buffer_hash(pd.DatetimeIndex(values).asi8[::step]) + str(values.dtype).encode()
+    else:
+        values = values[::step]
+    return _buffer_hash(pd.util.hash_array(np.asarray(values, dtype=object)))
+
+
+def fingerprint(df, sample=None):
+    """
+    Content digest of a dataframe for checking whether it changed. The raw buffer of each column is hashed
+    with crc32 and adler32 (categoricals by their codes, object columns by pandas.util.hash_array) and the
+    hashes are combined with the shape, column names, dtypes and index into a blake2b digest. The digest is
+    the same across processes and sessions for the same data.
+    With sample only a strided sample of about sample rows is hashed, which answers in well under a second
+    on very large frames but misses changes to the rows in between.
+    :param df: pandas dataframe
+    :param sample: int, number of rows to hash, None hashes every row
+    :return: str, 32 character hex digest
+
+    Usage
+    >>> import pandas as pd
+    >>> from datamallet.tabular.utils import fingerprint
+    >>> df = pd.DataFrame({'A':[1,2,3,4,5],'B':[2,4,6,8,10],'C':['dog','cat', 'sheep','dog','cat']})
+    >>> fingerprint(df) == fingerprint(df.copy())
+    True
+    >>> fingerprint(df) == fingerprint(df.assign(B=df['B'] + 1))
+    False
+
+    """
+    assert isinstance(df, pd.DataFrame), "df must be a pandas dataframe"
+    assert sample is None or (isinstance(sample, int) and sample > 0), "sample must be None or a positive integer"
+    step = 1 if sample is None else max(len(df) // sample, 1)
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((df.shape, step, list(df.columns), [str(dtype) for dtype in df.dtypes])).encode())
+    digest.update(_values_hash(df.index, step))
+    for position in range(df.shape[1]):
+        digest.update(_values_hash(df.iloc[:, position], step))
+    return digest.hexdigest()
+
+
+def _sample_rows(df, sample):
+    """
+    Strided sample of about sample rows and the factor scaling sample sizes up to the whole dataframe
+    """
+    if sample is None or len(df) <= sample:
+        return df, 1.0
+    sampled = df.iloc[::len(df) // sample]
+    return sampled, len(df) / len(sampled)
+
+
+def _category_bytes(series, n_rows):
+    """
+    Bytes of series as a category column of n_rows rows, codes plus the distinct values
+    """
+    categories = pd.Index(series.dropna().unique())
+    codes = np.int8 if len(categories) < 2**7 else np.int16 if len(categories) < 2**15 else np.int32
+    return n_rows * np.dtype(codes).itemsize + categories.memory_usage(deep=True)
+
+
+def memory_report(df, sample=None, category_ratio=0.5, lossless_float=True):
+    """
+    Deep memory usage of every column, string payloads included, with the dtype downcast_dtype recommends
+    and the bytes the column would take in that dtype. With sample the bytes of object columns and the
+    recommendations come from a strided sample of about sample rows and are scaled to the whole dataframe,
+    so min, max and distinct values outside the sample are missed.
+    :param df: pandas dataframe
+    :param sample: int, number of rows to measure, None measures every row
+    :param category_ratio: float, passed to downcast_dtype
+    :param lossless_float: bool, passed to downcast_dtype
+    :return: pandas dataframe indexed by column name with columns dtype, bytes, suggested_dtype,
+            bytes_after and bytes_saved, suggested_dtype is None when the dtype is already the smallest
+
+    Usage
+    >>> import pandas as pd
+    >>> from datamallet.tabular.utils import memory_report
+    >>> df = pd.DataFrame({'A':[1,2,3,4,5],'B':[2,4,6,8,10],'C':['dog','cat', 'sheep','dog','cat'],
+    ... 'D':['male','male','male','female','female']})
+    >>> memory_report(df)['suggested_dtype'].tolist()
+    [dtype('int8'), dtype('int8'), None, 'category']
+
+    """
+    assert isinstance(df, pd.DataFrame), "df must be a pandas dataframe"
+    assert sample is None or (isinstance(sample, int) and sample > 0), "sample must be None or a positive integer"
+    sampled, scale = _sample_rows(df, sample)
+
+    rows = list()
+    for position, col in enumerate(df.columns):
+        series = sampled.iloc[:, position]
+        if series.dtype == object:
+            size = int(series.memory_usage(index=False, deep=True) * scale)
+        else:
+            size = int(df.iloc[:, position].memory_usage(index=False, deep=True))
+        suggested = downcast_dtype(series, category_ratio=category_ratio, lossless_float=lossless_float)
+        if suggested is None:
+            size_after = size
+        elif suggested == 'category':
+            size_after = int(_category_bytes(series, len(df)))
+        else:
+            size_after = len(df) * suggested.itemsize
+        rows.append({'column': col, 'dtype': series.dtype, 'bytes': size, 'suggested_dtype': suggested,
+                     'bytes_after': size_after, 'bytes_saved': size - size_after})
+
+    return pd.DataFrame(rows, columns=['column', 'dtype', 'bytes', 'suggested_dtype',
+                                       'bytes_after', 'bytes_saved']).set_index('column')
+
+
+def _column_buffers(df, scale):
+    """
+    Scaled deep bytes of every column of df keyed by the address and size of the array holding its values,
+    a column that is a view of another column has the same key, a column whose values cannot be reached
+    without converting them gets a key of its own
+    """
+    buffers = dict()
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        if isinstance(series.dtype, np.dtype):
+            values = np.asarray(series)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.codes.to_numpy()
+        elif isinstance(series.dtype, pd.DatetimeTZDtype):
+            values = series.array.asi8
+        else:
+            values = getattr(series.array, '_data', None)
+        if isinstance(values, np.ndarray) and values.size > 0:
+            key = (values.__array_interface__['data'][0], values.shape, values.strides)
+        else:
+            key = ('column', id(df), position)
+        buffers[key] = series.memory_usage(index=False, deep=True) * scale
+    return buffers
+
+
+def estimate_peak_memory(df, steps, sample=10000):
+    """
+    Estimates the peak memory of running a list of datamallet transformers on df one after the other.
+    Clones of the steps are fitted and run on a strided sample of about sample rows, the columns each step
+    copies are found by checking which output columns are views of columns already in memory, and the sizes
+    are scaled to the whole dataframe. While a step runs its input and its output are both in memory, on top
+    of df itself which the caller holds. A copied object column is counted with its strings although a
+    copy shares them with the original, so the estimate is an upper bound for frames with object columns.
+    :param df: pandas dataframe
+    :param steps: list of datamallet transformers, or a pipeline with a steps attribute
+    :param sample: int, number of rows to run the steps on, None runs them on every row
+    :return: pandas dataframe with a row per step and columns step, bytes_out (deep bytes of the output),
+            bytes_copied (bytes of the output columns that are not views of the input) and peak_bytes,
+            the largest peak_bytes is the estimate for the whole run
+
+    Usage
+    >>> import pandas as pd
+    >>> from datamallet.tabular.utils import estimate_peak_memory
+    >>> from datamallet.tabular.imputation import NaFiller
+    >>> from datamallet.tabular.feature import SimpleEncoder
+    >>> df = pd.DataFrame({'A':[1,None,3,4,5],'C':['dog','cat', 'sheep','dog','cat']})
+    >>> report = estimate_peak_memory(df, steps=[NaFiller(method='mean'), SimpleEncoder(columns=['C'])])
+    >>> peak = report['peak_bytes'].max()
+
+    """
+    assert isinstance(df, pd.DataFrame), "df must be a pandas dataframe"
+    assert sample is None or (isinstance(sample, int) and sample > 0), "sample must be None or a positive integer"
+    steps = getattr(steps, 'steps', steps)
+    steps = [step[-1] if isinstance(step, tuple) else step for step in steps]
+    sampled, scale = _sample_rows(df, sample)
+
+    held = _column_buffers(sampled, scale)
+    base = sum(held.values()) + df.index.memory_usage(deep=True)
+    X = sampled
+    in_buffers = held
+    rows = list()
+    for step in steps:
+        output = clone(step).fit_transform(X)
+        out_buffers = _column_buffers(output if isinstance(output, pd.DataFrame) else output.to_frame(), scale)
+        copied = {key: size for key, size in out_buffers.items() if key not in in_buffers}
+        live = {key: size for key, size in list(in_buffers.items()) + list(out_buffers.items()) if key not in held}
+        rows.append({'step': type(step).__name__,
+                     'bytes_out': int(sum(out_buffers.values())),
+                     'bytes_copied': int(sum(copied.values())),
+                     'peak_bytes': int(base + sum(live.values()))})
+        X, in_buffers = output, out_buffers
+
+    return pd.DataFrame(rows, columns=['step', 'bytes_out', 'bytes_copied', 'peak_bytes'])
+
@@ -38,5 +38,7 @@ setup(
                       'scikit-learn>=0.24.2',
                       'numpy>=1.19.5',
                       'scipy==1.5.4',
-                      'plotly>=5.3.1']
+                      'plotly>=5.3.1'],
+    # parquet sources, ChunkedRunner.write and CachedTransformer read and write through pyarrow
+    extras_require={'parquet': ['pyarrow>=1.0.0']}
 )
\ No newline at end of file
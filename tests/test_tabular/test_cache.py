@@ -0,0 +1,58 @@
+import pandas as pd
+import numpy as np
+import pytest
+from datamallet.tabular.cache import CachedTransformer, _transformer_digest
+from datamallet.tabular.feature import SimpleEncoder
+from datamallet.tabular.imputation import NaFiller
+from datamallet.tabular.preprocess import FunctionMapper, MemoryOptimizer
+
+df = pd.DataFrame({'A': [1, 2, 3, 4, 5],
+                   'B': [2, np.nan, 6, 8, 10],
+                   'C': ['dog', 'cat', 'sheep', 'dog', 'cat'],
+                   'D': pd.Categorical(['male', 'male', 'male', 'female', 'female'])})
+
+
+def test_cached_transformer(tmp_path):
+    try:
+        import pyarrow
+    except ImportError:
+        pytest.skip('pyarrow is not available')
+    encoder = CachedTransformer(SimpleEncoder(columns=['C']), cache_dir=str(tmp_path))
+    expected = SimpleEncoder(columns=['C']).transform(X=df)
+    pd.testing.assert_frame_equal(encoder.transform(X=df), expected, check_dtype=False)
+    pd.testing.assert_frame_equal(encoder.transform(X=df), expected, check_dtype=False)
+    assert (encoder.hits_, encoder.misses_) == (1, 1)
+
+    encoder.transform(X=df.iloc[:3])
+    assert encoder.misses_ == 2
+
+    optimizer = CachedTransformer(MemoryOptimizer(), cache_dir=str(tmp_path)).fit(X=df)
+    optimizer.transform(X=df)
+    optimizer.transform(X=df.iloc[:3])
+    optimizer.transform(X=df)
+    assert (optimizer.hits_, optimizer.misses_) == (1, 2)
+
+    filler = CachedTransformer(NaFiller(method='mean'), cache_dir=str(tmp_path), max_bytes=1)
+    filler.transform(X=df)
+    assert len(list(tmp_path.glob('*.feather'))) == 0
+
+
+def double(row):
+    return row['A'] * 2
+
+
+def test_transformer_digest():
+    digest = _transformer_digest(FunctionMapper(func=double, new_col_name='F'))
+    assert digest == _transformer_digest(FunctionMapper(func=double, new_col_name='F'))
+
+    def edited(row):
+        return row['A'] * 3
+    edited.__name__, edited.__qualname__ = 'double', 'double'  # the same function after editing its body
+    assert digest != _transformer_digest(FunctionMapper(func=edited, new_col_name='F'))
+    assert _transformer_digest(FunctionMapper(func=lambda row: row['A'] * 2, new_col_name='F')) is not None
+
+    # attributes set by transform (bytes_saved_) are not part of the key
+    optimizer = CachedTransformer(MemoryOptimizer()).fit(X=df)
+    path = optimizer._path(df)
+    optimizer.transformer.transform(X=df.iloc[:3])
+    assert optimizer._path(df) == path
@@ -86,6 +86,14 @@ def test_simple_encoder():
     assert 'B_c' in encoded_df.columns
 
 
+def test_simple_encoder_partial_fit():
+    encoder = SimpleEncoder(columns=['C', 'D'])
+    encoder.partial_fit(df.iloc[:2]).partial_fit(df.iloc[2:])
+    encoded_df = encoder.transform(X=df.iloc[3:])
+    assert list(encoded_df.columns) == list(SimpleEncoder(columns=['C', 'D']).transform(X=df).columns)
+    assert encoded_df['C_sheep'].sum() == 0
+
+
 
 
 
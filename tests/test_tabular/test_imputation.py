@@ -95,3 +95,13 @@ def test_dropPercentageMissing():
     bn = DropPercentageMissing(threshold=20).transform(X=df)
 
     assert 'toy' not in bn.columns
+
+
+def test_NaFiller_partial_fit():
+    nafiller = NaFiller(method='mean', column_list=['A', 'B'])
+    nafiller.partial_fit(df2.iloc[:3]).partial_fit(df2.iloc[3:])
+    cx = nafiller.transform(X=df2.iloc[:3])
+    assert cx['A'].iloc[0] == df2['A'].mean()
+    assert cx['B'].iloc[1] == df2['B'].mean()
+    assert not hasattr(nafiller.fit(df2), 'means_')
+
@@ -0,0 +1,44 @@
+import pandas as pd
+import numpy as np
+from datamallet.tabular.parallel import ColumnParallel, SharedFrame, attach_frame, parallel_apply
+from datamallet.tabular.feature import ExpandingTransformer, SimpleEncoder
+from datamallet.tabular.imputation import NaFiller
+
+df = pd.DataFrame({'A': [1, np.nan, 3, 4, 5],
+                   'B': [2, 4, np.nan, np.nan, 10],
+                   'C': ['dog', 'cat', 'sheep', 'dog', 'cat'],
+                   'D': [0.5, 0.1, 0.2, np.nan, 0.3],
+                   'E': ['male', 'male', 'male', 'female', 'female']})
+
+
+def test_shared_frame():
+    df_s = df.assign(F=pd.Categorical(df['C']),
+                     G=pd.date_range('2021-01-01', periods=len(df), tz='UTC')).set_index('G', drop=False)
+    with SharedFrame(df_s) as shared:
+        with attach_frame(shared.descriptor()) as df_a:
+            pd.testing.assert_frame_equal(df_a, df_s)
+            assert not df_a['A'].to_numpy().flags.writeable
+        with attach_frame(shared.descriptor(columns=['A', 'F'], rows=(1, 4))) as df_a:
+            pd.testing.assert_frame_equal(df_a, df_s[['A', 'F']].iloc[1:4])
+
+
+def test_parallel_apply():
+    result = parallel_apply(X=df, func=len, col_name='C', n_jobs=2)
+    assert result.tolist() == df['C'].str.len().tolist()
+
+
+def test_column_parallel():
+    for transformer in [ExpandingTransformer(column_list=['A', 'B', 'D']),
+                        NaFiller(method='ffill'),
+                        SimpleEncoder()]:
+        for backend in ['thread', 'process']:
+            df_p = ColumnParallel(transformer, n_jobs=2, backend=backend, n_shards=2).transform(X=df)
+            pd.testing.assert_frame_equal(df_p, transformer.transform(X=df))
+
+
+def test_column_parallel_partial_fit():
+    encoder = ColumnParallel(SimpleEncoder(columns=['C', 'E']), n_jobs=2)
+    encoder.partial_fit(df.iloc[:2]).partial_fit(df.iloc[2:])
+    assert encoder.shards_ == [['C'], ['E']]
+    df_p = encoder.transform(X=df.iloc[:1])
+    assert list(df_p.columns) == list(SimpleEncoder(columns=['C', 'E']).transform(X=df).columns)
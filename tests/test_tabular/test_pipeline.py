@@ -0,0 +1,126 @@
+import pandas as pd
+import numpy as np
+import pytest
+from datamallet.tabular.pipeline import LazyPipeline, ChunkedRunner, _iter_source
+from datamallet.tabular.preprocess import ColumnDropper, ColumnRename, ColumnSelector, MemoryOptimizer, TypeInferrer
+from datamallet.tabular.imputation import NaFiller
+from datamallet.tabular.feature import ColumnAdder, ColumnSubtraction, ExpandingTransformer, SimpleEncoder
+from datamallet.tabular.timeseries import LagFeatures
+
+df = pd.DataFrame({'A': [1, 2, 3, 4, 5],
+                   'B': [2, np.nan, 6, 8, 10],
+                   'C': ['dog', 'cat', 'sheep', 'dog', 'cat'],
+                   'D': [0.5, 0.1, np.nan, 0.4, 0.3],
+                   'E': [True, True, False, True, True]})
+
+
+def run_eagerly(steps, X):
+    for step in steps:
+        X = step.transform(X)
+    return X
+
+
+def test_lazy_pipeline():
+    steps = [ColumnDropper(column_list=['C']),
+             ColumnRename(rename_dictionary={'A': 'V'}),
+             ColumnAdder(column_list=['V', 'D'], new_column_name='Z'),
+             ColumnSelector(column_list=['V', 'B', 'D']),
+             NaFiller(column_list=['B'], method='mean'),
+             ColumnSubtraction(left='V', right='B', new_column_name='W')]
+    pipeline = LazyPipeline(steps=steps)
+    df_l = pipeline.transform(X=df)
+
+    pd.testing.assert_frame_equal(df_l, run_eagerly(steps, df))
+    assert pipeline.source_columns_ == ['A', 'B', 'D']
+    assert pipeline.pruned_steps_ == [steps[2]]
+    assert len(pipeline.plan_) == 3  # dropper, rename and selector are one projection
+
+
+def test_lazy_pipeline_opaque_step():
+    steps = [ColumnSelector(column_list=['A', 'D']),
+             LagFeatures(lags=[1], column_list=['D']),
+             ColumnDropper(column_list=['A'])]
+    pipeline = LazyPipeline(steps=steps)
+    pd.testing.assert_frame_equal(pipeline.transform(X=df), run_eagerly(steps, df))
+    assert pipeline.source_columns_ == ['A', 'D']
+
+
+def test_lazy_pipeline_csv(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    df.to_csv(path, index=False)
+    pipeline = LazyPipeline(steps=[ColumnSelector(column_list=['D', 'A'])])
+    df_l = pipeline.transform(X=path)
+    assert list(df_l.columns) == ['D', 'A']
+    assert np.allclose(df_l['A'], df['A'])
+
+
+def test_chunked_runner(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    df.to_csv(path, index=False)
+    steps = [ColumnDropper(column_list=['E']),
+             NaFiller(method='mean'),
+             ColumnAdder(column_list=['A', 'B'], new_column_name='Z'),
+             SimpleEncoder(columns=['C'])]
+    expected = run_eagerly(steps, df)
+
+    runner = ChunkedRunner(steps=steps, chunk_size=2).fit(path)
+    df_c = runner.transform(path)
+    assert list(df_c.columns) == list(expected.columns)
+    assert np.allclose(df_c.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+    assert runner.steps_[1].means_['B'] == df['B'].mean()
+
+    chunks = list(ChunkedRunner(steps=steps, chunk_size=2, prefetch=0).fit(df).iter_transform(df))
+    assert len(chunks) == 3
+    assert all(list(chunk.columns) == list(expected.columns) for chunk in chunks)
+
+    df_p = ChunkedRunner(steps=steps, chunk_size=2, n_jobs=2).fit(df).transform(df)
+    pd.testing.assert_frame_equal(df_p, pd.concat(chunks))
+
+
+def test_chunked_runner_fill_across_chunks():
+    gaps = pd.DataFrame({'A': [1, np.nan, np.nan, np.nan, 5, np.nan], 'B': [np.nan, 2, np.nan, np.nan, np.nan, 6]})
+    for step in [NaFiller(method='ffill'), NaFiller(method='bfill'),
+                 NaFiller(method='ffill', limit=2), NaFiller(method='bfill', limit=1, column_list=['B'])]:
+        expected = step.transform(X=gaps)
+        for n_jobs in [None, 2]:
+            runner = ChunkedRunner(steps=[step], chunk_size=2, n_jobs=n_jobs).fit(gaps)
+            pd.testing.assert_frame_equal(runner.transform(gaps), expected)
+    assert ChunkedRunner(steps=[NaFiller(method='ffill')], chunk_size=2).fit(gaps).transform(gaps)['A'].tolist() \
+        == [1, 1, 1, 1, 5, 5]
+
+    with pytest.raises(AssertionError):
+        ChunkedRunner(steps=[ExpandingTransformer(column_list=['A'])])
+
+
+def test_chunked_runner_fit_only_steps():
+    # TypeInferrer has no partial_fit, it is fitted on the first chunk
+    steps = [ColumnSelector(column_list=['A', 'C']), MemoryOptimizer(), TypeInferrer()]
+    runner = ChunkedRunner(steps=steps, chunk_size=3).fit(df)
+    assert runner.steps_[1].dtypes_ == {'A': np.dtype('int8')}
+    assert runner.steps_[2].parsers_ == {}
+    assert runner.pipeline_.source_columns_ == ['A', 'C']
+    chunks = list(runner.iter_transform(df))
+    assert [list(chunk.columns) for chunk in chunks] == [['A', 'C'], ['A', 'C']]
+    assert pd.concat(chunks)['A'].dtype == np.int8
+
+    first_chunk = next(_iter_source(df, columns=['C', 'A'], chunk_size=3, read_kwargs=dict()))
+    assert list(first_chunk.columns) == ['A', 'C']
+
+    # MemoryOptimizer is fitted on every chunk, so a later chunk with a larger value widens the dtype
+    wide = pd.DataFrame({'A': [1, 2, 3, 4, 500, 6], 'G': ['m', 'm', 'f', 'f', 'm', 'x']})
+    runner = ChunkedRunner(steps=[MemoryOptimizer()], chunk_size=2).fit(wide)
+    chunks = list(runner.iter_transform(wide))
+    assert [chunk['A'].dtype for chunk in chunks] == [np.dtype('int16')] * 3
+    assert all(chunk['G'].dtype == pd.CategoricalDtype(['f', 'm', 'x']) for chunk in chunks)
+    assert pd.concat(chunks)['A'].tolist() == wide['A'].tolist()
+
+
+def test_chunked_runner_write(tmp_path):
+    try:
+        import pyarrow
+    except ImportError:
+        pytest.skip('pyarrow is not available')
+    path = str(tmp_path / 'features.parquet')
+    runner = ChunkedRunner(steps=[SimpleEncoder(columns=['C'])], chunk_size=2).fit(df)
+    assert runner.write(df, path=path) == len(df)
+    assert pd.read_parquet(path).shape == (len(df), 7)
@@ -1,5 +1,9 @@
 from datamallet.tabular.preprocess import (ColumnDropper,
-                                           ColumnRename)
+                                           ColumnRename,
+                                           FunctionMapper,
+                                           ColumnSelector,
+                                           MemoryOptimizer,
+                                           TypeInferrer)
 import pandas as pd
 import numpy as np
 
@@ -34,6 +38,24 @@ def test_column_dropper():
     assert 'C' not in dropped_df.columns
     assert 'D' not in dropped_df.columns
     assert 'E' not in dropped_df.columns
+    assert np.shares_memory(dropped_df['A'].values, df['A'].values)
+    assert list(column_dropper.get_feature_names_out(list(df.columns))) == ['A', 'B']
+
+
+def test_column_selector():
+    column_selector = ColumnSelector(column_list=['C', 'A'])
+    selected_df = column_selector.transform(X=df)
+
+    assert list(selected_df.columns) == ['C', 'A']
+    assert np.shares_memory(selected_df['A'].values, df['A'].values)
+    assert list(column_selector.get_feature_names_out()) == ['C', 'A']
+
+    # the output is a view, writing into it writes into the input unless it is copied first
+    df_v = df.copy()
+    ColumnSelector(column_list=['A']).transform(X=df_v).loc[0, 'A'] = 999
+    assert df_v.loc[0, 'A'] == 999
+    ColumnDropper(column_list=['C']).transform(X=df_v).copy().loc[0, 'A'] = 1
+    assert df_v.loc[0, 'A'] == 999
 
 
 def test_column_rename():
@@ -50,10 +72,75 @@ def test_column_rename():
     assert 'E' in renamed_df.columns
 
 
-
-
-
-
-
-
-
+def weighted_sum(row):
+    return row['A'] + 2 * row['B'] + len(row['C'])
+
+
+def test_function_mapper():
+    expected = df['A'] + 2 * df['B'] + df['C'].str.len()
+    mapped_df = FunctionMapper(func=weighted_sum, new_col_name='F').transform(X=df)
+    assert (mapped_df['F'] == expected).all()
+
+    vectorized_df = FunctionMapper(func=lambda X: X['A'] + 2 * X['B'] + X['C'].str.len(),
+                                   new_col_name='F',
+                                   vectorized=True).transform(X=df)
+    assert (vectorized_df['F'] == expected).all()
+
+    parallel_df = FunctionMapper(func=weighted_sum, new_col_name='F', n_jobs=2).transform(X=df)
+    assert (parallel_df['F'] == expected).all()
+    assert 'F' not in df.columns
+
+
+def test_memory_optimizer():
+    optimizer = MemoryOptimizer(category_ratio=0.4)
+    df_d = df2.assign(D=df['D'].tolist() + ['male'])
+    optimized_df = optimizer.fit_transform(X=df_d)
+    assert optimizer.dtypes_ == {'A': np.dtype('float32'), 'B': np.dtype('float32'),
+                                 'C': np.dtype('float32'), 'D': pd.CategoricalDtype(['female', 'male'])}
+    assert optimized_df['D'].dtype == 'category'
+    halves = [optimizer.transform(X=half) for half in (df_d.iloc[:2], df_d.iloc[2:])]
+    assert halves[0]['D'].dtype == halves[1]['D'].dtype
+    assert pd.concat(halves)['D'].dtype == 'category'
+    assert optimizer.transform(X=df_d.assign(D='other'))['D'].dtype == object
+    assert optimizer.bytes_saved_ > 0
+
+    optimizer = MemoryOptimizer(column_list=['A', 'B']).fit(X=df)
+    assert optimizer.dtypes_ == {'A': np.dtype('int8'), 'B': np.dtype('int8')}
+    out_of_range_df = optimizer.transform(X=df.assign(B=[2, 4, 6, 8, 1000]))
+    assert out_of_range_df['A'].dtype == np.int8
+    assert out_of_range_df['B'].dtype == np.int64
+    float_df = optimizer.transform(X=df.assign(A=[1.7, 2.2, 3.9, np.nan, 5.0]))
+    assert float_df['A'].tolist()[:3] == [1.7, 2.2, 3.9]
+
+    optimizer = MemoryOptimizer(column_list=['A', 'B']).partial_fit(X=df).partial_fit(X=df.assign(B=[2, 4, 6, 8, 1000]))
+    assert optimizer.dtypes_ == {'A': np.dtype('int8'), 'B': np.dtype('int16')}
+    assert optimizer.partial_fit(X=df.assign(A=[1.5, 2, 3, 4, 5])).dtypes_ == {'B': np.dtype('int16')}
+
+
+def test_type_inferrer():
+    df_s = pd.DataFrame({'A': ['1', '2', '3', '4.5', None, '6'],
+                         'B': ['1/2/2019', '1/3/2019', '1/24/2019', '2/1/2019', '2/2/2019', None],
+                         'C': ['dog', 'cat', 'sheep', 'dog', 'cat', 'dog'],
+                         'D': ['Yes', 'no', 'yes', 'no', 'no', 'yes'],
+                         'E': [1, 2, 3, 4, 5, 6]})
+    inferrer = TypeInferrer()
+    inferred_df = inferrer.fit_transform(X=df_s)
+    assert inferrer.parsers_ == {'A': ('numeric', None), 'B': ('datetime', '%m/%d/%Y'), 'D': ('boolean', None)}
+    assert inferred_df['A'].tolist()[:4] == [1, 2, 3, 4.5]
+    assert inferred_df['B'].iloc[2] == pd.Timestamp('2019-01-24')
+    assert inferred_df['D'].tolist() == [True, False, True, False, False, True]
+    assert inferred_df['C'].dtype == object
+    assert inferrer.skipped_columns_ == []
+
+    failing_df = inferrer.transform(X=df_s.assign(A=['1', 'x', 'y', '4', '5', '6']))
+    assert failing_df['A'].dtype == object
+    assert inferrer.skipped_columns_ == ['A']
+    assert TypeInferrer(max_failure_rate=0.5).fit(X=df_s.assign(A=['1', 'x', 'y', '4', '5', '6'])).parsers_['A'] \
+        == ('numeric', None)
+
+
+    dates = pd.DataFrame({'B': ['2019-01-02', 'bad', '2019-01-24'], 'Z': ['02139', '10001', '94105']})
+    assert TypeInferrer(max_failure_rate=0.4).fit(X=dates).parsers_['B'] == ('datetime', '%Y-%m-%d')
+    assert TypeInferrer().fit(X=dates).parsers_ == {}
+    assert TypeInferrer().fit_transform(X=dates)['Z'].tolist() == ['02139', '10001', '94105']
+    assert TypeInferrer().fit(X=dates.assign(Z=pd.Series([1, 2, 3], dtype=object))).parsers_['Z'] == ('numeric', None)
@@ -1,5 +1,11 @@
 import pandas as pd
-from datamallet.tabular.timeseries import Resampler, RollingWindow
+import numpy as np
+from datamallet.tabular.utils import sorted_time_index
+from datamallet.tabular.timeseries import (Resampler, RollingWindow, StreamingResampler,
+                                          ResamplerPyramid, StreamingRollingWindow,
+                                          RollingCorrelation, LagFeatures, EWMTransformer,
+                                          CalendarFeatures, TimeIndexer, TimeRegularizer,
+                                          TimeSlicer)
 
 d = {'price': [10, 11, 9, 13, 14, 18, 17, 19,10, 11, 9, 13, 14, 18, 17, 19,50, 60, 40, 100, 50, 100, 40,10, 11, 9, 13, 14, 18, 17, 19,10,],
      'volume': [50, 60, 40, 100, 50, 100, 40, 50,10, 11, 9, 13, 14, 18, 17, 19,50, 60, 40, 100, 50, 100, 40,10, 11, 9, 13, 14, 18, 17, 19,10,]}
@@ -38,3 +44,229 @@ def test_rollingwindow():
     roller = RollingWindow(window='4H', aggregation_method='max')
     df_r = roller.transform(X=df)
     assert df_r['price'].sum() == 1164.0
+
+
+def test_streaming_resampler():
+    resampler = StreamingResampler(rule='2H', aggregation_method='mean')
+    batches = [resampler.transform(X=df.iloc[i:i + 5]) for i in range(0, 32, 5)]
+    batches.append(resampler.flush())
+    df_s = pd.concat(batches)
+    df_r = Resampler(rule='2H', aggregation_method='mean').transform(X=df)
+    assert df_s.shape[0] == 16
+    assert np.allclose(df_s.values, df_r.values)
+
+
+def test_streaming_resampler_large_values():
+    df_l = df[['price']] + 1e8
+    resampler = StreamingResampler(rule='2H', aggregation_method='std')
+    df_s = pd.concat([resampler.transform(X=df_l.iloc[i:i + 3]) for i in range(0, 32, 3)] + [resampler.flush()])
+    assert np.allclose(df_s['price'], df_l.resample('2H')['price'].std(), rtol=1e-6)
+
+
+def test_streaming_resampler_watermark():
+    resampler = StreamingResampler(rule='2H', aggregation_method='sum', watermark='1H')
+    df_s = resampler.transform(X=df.iloc[:5])
+    assert df_s.shape[0] == 1  # 04:00 minus the 1H watermark only closes the first bucket
+    resampler.transform(X=df.iloc[2:3])  # late row, its bucket is still open
+    df_s = resampler.transform(X=df.iloc[0:1])  # late row, its bucket was emitted
+    assert resampler.late_rows_ == 1
+    assert resampler.flush()['price'].sum() == df['price'].iloc[2:5].sum() + df['price'].iloc[2]
+
+
+def test_resampler_multiple_aggregations():
+    df_r = Resampler(rule='2H', aggregation_method=['mean', 'max', 'quantile(0.5)']).transform(X=df)
+    assert df_r.shape == (16, 6)
+    assert np.allclose(df_r[('price', 'mean')], df.resample('2H')['price'].mean())
+    assert np.allclose(df_r[('volume', 'quantile(0.5)')], df.resample('2H')['volume'].median())
+
+    df_ohlc = Resampler(rule='4H', aggregation_method='ohlc').transform(X=df)
+    assert list(df_ohlc['price'].columns) == ['open', 'high', 'low', 'close']
+    assert df_ohlc[('price', 'open')].iloc[1] == df['price'].iloc[4]
+
+    df_d = Resampler(rule='2H', aggregation_method={'price': 'first', 'volume': 'count'}).transform(X=df)
+    assert list(df_d.columns) == ['price', 'volume']
+    assert (df_d['volume'] == 2).all()
+
+
+def test_resampler_group_by():
+    panel = df.copy()
+    panel['device'] = ['a', 'b'] * 16
+    panel = panel.iloc[np.r_[0:10, 14:32]]
+    df_g = Resampler(rule='4H', aggregation_method=['sum', 'max'], group_by='device').transform(X=panel)
+    expected = panel.drop(columns='device').groupby(panel['device']).resample('4H')
+    assert df_g.index.names == ['device', 'week_starting']
+    assert np.allclose(df_g[('price', 'sum')], expected['price'].sum())
+    assert np.allclose(df_g[('volume', 'max')], expected['volume'].max())
+
+    df_long = Resampler(rule='4H', group_by='device', long_format=True).transform(X=panel)
+    assert list(df_long.columns) == ['device', 'week_starting', 'price', 'volume']
+    assert df_long.shape[0] == df_g.shape[0]
+
+
+def test_resampler_pyramid():
+    levels = ResamplerPyramid(rules=['2H', '4H', '8H'], aggregation_method=['mean', 'std']).transform(X=df)
+    assert list(levels.keys()) == ['2H', '4H', '8H']
+    for rule, df_level in levels.items():
+        df_r = Resampler(rule=rule, aggregation_method=['mean', 'std']).transform(X=df)
+        assert df_level.shape == df_r.shape
+        assert np.allclose(df_level.values, df_r.values, equal_nan=True)
+
+
+def test_streaming_rollingwindow():
+    for aggregation_method in ['mean', 'std', 'max']:
+        roller = StreamingRollingWindow(window='4H', aggregation_method=aggregation_method)
+        df_s = pd.concat([roller.transform(X=df.iloc[i:i + 3]) for i in range(0, 32, 3)])
+        df_r = df.rolling('4H').agg(aggregation_method)
+        assert df_s.shape == df_r.shape
+        assert np.allclose(df_s.values, df_r.values, equal_nan=True)
+
+    df_l = df + 1e8
+    for aggregation_method in ['std', 'sum']:
+        roller = StreamingRollingWindow(window='4H', aggregation_method=aggregation_method)
+        df_s = pd.concat([roller.transform(X=df_l.iloc[i:i + 3]) for i in range(0, 32, 3)])
+        assert np.allclose(df_s.values, df_l.rolling('4H').agg(aggregation_method).values, rtol=1e-6, equal_nan=True)
+
+
+def test_rollingwindow_multiple_windows():
+    for aggregation_method in ['mean', 'var', 'min', 'max', 'sum']:
+        df_r = RollingWindow(window=['2H', '4H', '8H'], aggregation_method=aggregation_method).transform(X=df)
+        assert df_r.shape == (32, 6)
+        assert list(df_r.columns) == ['price_2H', 'price_4H', 'price_8H', 'volume_2H', 'volume_4H', 'volume_8H']
+        for window in ['2H', '4H', '8H']:
+            df_single = RollingWindow(window=window, aggregation_method=aggregation_method).transform(X=df)
+            assert np.allclose(df_r['volume_' + window], df_single['volume'], equal_nan=True)
+    assert RollingWindow(window=['4H'], aggregation_method='max').transform(X=df)['price_4H'].sum() == 1164.0
+
+    # rows sharing a timestamp only see the rows before them, like pandas
+    df_d = pd.DataFrame({'price': [1.0, 2.0, 3.0, 3.0]},
+                        index=pd.to_datetime(['2018-01-01 00:00', '2018-01-01 00:00',
+                                              '2018-01-01 00:30', '2018-01-01 02:00']))
+    for closed in ['right', 'left']:
+        df_r = RollingWindow(window=['1H'], aggregation_method='sum', closed=closed).transform(X=df_d)
+        assert np.allclose(df_r['price_1H'], df_d.rolling('1H', closed=closed).sum()['price'], equal_nan=True)
+
+
+def test_rollingwindow_median_quantile():
+    df_median = RollingWindow(window='4H', aggregation_method='median').transform(X=df)
+    assert np.allclose(df_median['price'], df['price'].rolling('4H').median())
+
+    df_q = RollingWindow(window=4, aggregation_method='quantile(0.95)').transform(X=df)
+    assert df_q['price'].isna().sum() == 3
+    assert np.allclose(df_q['price'].iloc[3:], df['price'].rolling(4).quantile(0.95).iloc[3:])
+
+    df_r = RollingWindow(window=[4, '8H'], aggregation_method='median').transform(X=df)
+    assert list(df_r.columns) == ['price_4', 'price_8H', 'volume_4', 'volume_8H']
+
+
+def test_rolling_correlation():
+    df_c = RollingCorrelation(window='4H', pairs=[('price', 'volume')]).transform(X=df)
+    assert list(df_c.columns) == ['price_volume_corr']
+    assert np.allclose(df_c['price_volume_corr'], df['price'].rolling('4H').corr(df['volume']), equal_nan=True)
+
+    df_cov = RollingCorrelation(window=4, target='volume', aggregation_method='cov', dtype='float32').transform(X=df)
+    assert list(df_cov.columns) == ['price_volume_cov']
+    assert df_cov['price_volume_cov'].dtype == np.float32
+    assert np.allclose(df_cov['price_volume_cov'], df['price'].rolling(4).cov(df['volume']),
+                       rtol=1e-4, equal_nan=True)
+
+    df_d = pd.DataFrame({'x': [1.0, 2.0, 3.0, 4.0], 'y': [1.0, 2.0, 3.0, 5.0]},
+                        index=pd.to_datetime(['2018-01-01 00:00', '2018-01-01 00:00',
+                                              '2018-01-01 00:30', '2018-01-01 02:00']))
+    df_cov = RollingCorrelation(window='1H', pairs=[('x', 'y')], aggregation_method='cov').transform(X=df_d)
+    assert np.allclose(df_cov['x_y_cov'], df_d['x'].rolling('1H').cov(df_d['y']), equal_nan=True)
+
+
+def test_lag_features():
+    df_l = LagFeatures(lags=[1, 2, -1, '3H']).transform(X=df)
+    assert df_l.shape == (32, 10)
+    assert np.allclose(df_l['price_lag_2'], df['price'].shift(2), equal_nan=True)
+    assert np.allclose(df_l['volume_lead_1'], df['volume'].shift(-1), equal_nan=True)
+    assert np.allclose(df_l['price_lag_3H'], df['price'].shift(3), equal_nan=True)
+
+    panel = df.copy()
+    panel['device'] = ['a', 'b'] * 16
+    df_p = LagFeatures(lags=[1, '2H'], column_list=['price'], group_by='device').transform(X=panel)
+    assert np.allclose(df_p['price_lag_1'], panel.groupby('device')['price'].shift(1), equal_nan=True)
+    assert np.allclose(df_p['price_lag_2H'], panel.groupby('device')['price'].shift(1), equal_nan=True)
+
+    # a time lead reads the first row at or after t + 1H, never a row in between
+    df_u = df.iloc[[0, 1, 3, 4]]
+    df_lead = LagFeatures(lags=['-90T'], column_list=['price']).transform(X=df_u)
+    assert np.allclose(df_lead['price_lead_90T'], [df['price'].iloc[3], df['price'].iloc[3], np.nan, np.nan],
+                       equal_nan=True)
+
+
+def test_ewm_transformer():
+    for aggregation_method in ['mean', 'var', 'std']:
+        df_e = EWMTransformer(aggregation_method=aggregation_method, span=5).transform(X=df)
+        df_pandas = getattr(df.ewm(span=5), aggregation_method)()
+        assert np.allclose(df_e.values, df_pandas.values, equal_nan=True)
+
+    ewm = EWMTransformer(column_list=['price'], halflife='3H', stateful=True)
+    df_s = pd.concat([ewm.transform(X=df.iloc[i:i + 7]) for i in range(0, 32, 7)])
+    assert np.allclose(df_s['price'], df['price'].ewm(halflife='3H', times=df.index).mean())
+    assert (df_s['volume'] == df['volume']).all()
+
+
+def test_calendar_features():
+    df_c = CalendarFeatures(features=['hour', 'dayofweek', 'month', 'dayofyear', 'weekend', 'holiday'],
+                            cyclical=['hour'],
+                            holidays=['2018-01-02']).transform(X=df)
+    assert (df_c['hour'] == df.index.hour).all()
+    assert (df_c['dayofweek'] == df.index.dayofweek).all()
+    assert (df_c['dayofyear'] == df.index.dayofyear).all()
+    assert df_c['hour'].dtype == np.int8
+    assert df_c['holiday'].sum() == 8
+    assert df_c['weekend'].sum() == 0
+    assert np.allclose(df_c['hour_sin'], np.sin(2 * np.pi * df.index.hour / 24), atol=1e-6)
+
+
+def test_time_indexer():
+    raw = df.reset_index()
+    raw['week_starting'] = raw['week_starting'].dt.strftime('%Y/%m/%d %H:%M')
+    raw = raw.iloc[::-1]
+
+    indexer = TimeIndexer(column='week_starting', sort=True)
+    df_t = indexer.transform(X=raw)
+    assert indexer.format_ == '%Y/%m/%d %H:%M'
+    assert indexer.is_monotonic_ is False
+    assert indexer.has_duplicates_ is False
+    assert df_t.index.equals(df.index)
+    assert list(df_t.columns) == ['price', 'volume']
+    assert Resampler(rule='2H').transform(X=df_t).shape[0] == 16
+    assert sorted_time_index(df_t) is True
+    assert sorted_time_index(df_t.iloc[[0, 3, 1, 4, 2, 5]]) is False  # a reordered frame gets a new index
+
+
+def test_time_regularizer():
+    irregular = pd.concat([df.iloc[:10], df.iloc[5:8], df.iloc[15:]])
+    regularizer = TimeRegularizer(freq='1H', reducer='max', fill_method='ffill')
+    df_r = regularizer.transform(X=irregular)
+    assert df_r.index.equals(df.index)
+    assert df_r['price'].iloc[12] == df['price'].iloc[9]
+    assert regularizer.gap_stats_['out_of_order'] is True
+    assert regularizer.gap_stats_['rows_sharing_a_slot'] == 3
+    assert regularizer.gap_stats_['missing_slots'] == 5
+
+    df_i = TimeRegularizer(freq='30T', fill_method='interpolate').transform(X=df)
+    assert df_i.shape[0] == 63
+    assert df_i['price'].iloc[1] == (df['price'].iloc[0] + df['price'].iloc[1]) / 2
+
+
+def test_time_slicer():
+    start, end = df.index[3], df.index[10]
+    expected = df[(df.index >= start) & (df.index <= end)]
+    pd.testing.assert_frame_equal(TimeSlicer(windows=(start, end)).transform(X=df), expected)
+    pd.testing.assert_frame_equal(TimeSlicer(windows=(start, end)).transform(X=df.iloc[::-1]), expected)
+    assert TimeSlicer(windows=(start, end), inclusive='neither').transform(X=df).shape[0] == 6
+
+    slicer = TimeSlicer(windows=[(None, start), (start, None)], inclusive='left')
+    train, test = slicer.transform(X=df)
+    assert train.shape[0] == 3
+    assert train.shape[0] + test.shape[0] == df.shape[0]
+    assert slicer.positions(df).tolist() == [[0, 3], [3, df.shape[0]]]
+
+    # a date string on hourly data covers the whole day, like .loc
+    pd.testing.assert_frame_equal(TimeSlicer(windows=(None, '2018-01-01')).transform(X=df), df.loc[:'2018-01-01'])
+    assert TimeSlicer(windows=('2018-01-01', '2018-01-01')).transform(X=df).shape[0] == 24
+    assert TimeSlicer(windows=(None, '2018-01-01'), inclusive='left').transform(X=df).shape[0] == 0
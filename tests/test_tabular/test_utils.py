@@ -15,7 +15,15 @@ from datamallet.tabular.utils import (extract_numeric_cols,
                                       get_column_types,
                                       percentage_missing,
                                       missing_summary,
-                                      check_numeric)
+                                      check_numeric,
+                                      sorted_time_index,
+                                      infer_datetime_format,
+                                      fingerprint,
+                                      downcast_dtype,
+                                      memory_report,
+                                      estimate_peak_memory)
+from datamallet.tabular.imputation import NaFiller
+from datamallet.tabular.preprocess import ColumnSelector
 import pandas as pd
 import numpy as np
 
@@ -58,6 +66,18 @@ def test_time_index():
     assert time_index(df=df3) is False
 
 
+def test_sorted_time_index():
+    assert sorted_time_index(df=df4) is True
+    assert sorted_time_index(df=df4.iloc[::-1]) is False
+    assert sorted_time_index(df=df3) is False
+
+
+def test_infer_datetime_format():
+    assert infer_datetime_format(['1/2/2019', '1/3/2019', '1/24/2019']) == '%m/%d/%Y'
+    assert infer_datetime_format(pd.Series(['2019-01-02 10:00:00', None, '2019-01-03 11:30:00'])) == '%Y-%m-%d %H:%M:%S'
+    assert infer_datetime_format(['dog', 'cat']) is None
+
+
 def test_check_dataframe():
     assert check_dataframe(df=df3) is True
 
@@ -192,5 +212,51 @@ def test_missing_summary():
     assert ms['name'] == 0
 
 
-
+def test_fingerprint():
+    assert fingerprint(df) == fingerprint(df.copy())
+    assert len(fingerprint(df)) == 32
+    assert fingerprint(df) != fingerprint(df.assign(B=df['B'] + 1))
+    assert fingerprint(df) != fingerprint(df.assign(C=df['C'].str.upper()))
+    assert fingerprint(df) != fingerprint(df.assign(D=df['D'].cat.reorder_categories(['male', 'female'])))
+    assert fingerprint(df) != fingerprint(df.iloc[::-1])
+    assert fingerprint(df4) != fingerprint(df4.tz_localize('UTC'))
+    assert fingerprint(df5) == fingerprint(df5.copy())
+
+    df_s = df.assign(B=[2, 5, 6, 8, 10])  # changes a row the sample skips
+    assert fingerprint(df, sample=2) == fingerprint(df_s, sample=2)
+    assert fingerprint(df, sample=2) != fingerprint(df)
+
+
+def test_downcast_dtype():
+    assert downcast_dtype(df['A']) == np.int8
+    assert downcast_dtype(df['A'] * 1000) == np.int16
+    assert downcast_dtype(df5['age']) == np.float32
+    assert downcast_dtype(pd.Series([0.1, 0.2])) is None
+    assert downcast_dtype(pd.Series([0.1, 0.2]), lossless_float=False) == np.float32
+    assert downcast_dtype(df['C']) is None
+    assert downcast_dtype(df['C'], category_ratio=0.6) == 'category'
+    assert downcast_dtype(df['D']) is None
+
+
+def test_memory_report():
+    report = memory_report(df=df)
+    assert list(report.index) == list(df.columns)
+    assert report.loc['A', 'bytes'] == 40
+    assert report.loc['A', 'suggested_dtype'] == np.int8
+    assert report.loc['A', 'bytes_saved'] == 35
+    assert report.loc['C', 'bytes'] == df['C'].memory_usage(index=False, deep=True)
+    assert report.loc['E', 'suggested_dtype'] is None
+    assert memory_report(df=df, sample=2).loc['A', 'bytes'] == 40
+
+
+def test_estimate_peak_memory():
+    df_n = pd.DataFrame({'A': np.arange(1000.0), 'B': np.arange(1000.0), 'C': np.arange(1000.0)})
+    report = estimate_peak_memory(df_n, steps=[ColumnSelector(column_list=['A', 'B']),
+                                               NaFiller(method='mean')])
+    assert list(report['step']) == ['ColumnSelector', 'NaFiller']
+    assert list(report['bytes_copied']) == [0, 16000]
+    index_bytes = df_n.index.memory_usage(deep=True)
+    assert list(report['peak_bytes']) == [24000 + index_bytes, 40000 + index_bytes]
+    assert estimate_peak_memory(df_n, steps=[NaFiller(method='mean')], sample=100)['peak_bytes'][0] \
+        == 48000 + index_bytes
 